@@ -1,15 +1,15 @@
 import argparse
 import os
-import pickle
 import sys
-import zstandard
-import jinja2
 import tempfile
 from asimc.log import logger
-from asimc.parser import Parser
+from asimc.parser import Parser, Fragment, CHUNK_SIZE
+from asimc.cache import DiskCache
 from asimc.funcs import funcs
+from asimc.template import environment
 from asimc.translator import CppTranslator
 from asimr.constant import tmp, __version__
+from asimr import acb
 
 def make_name(file, tp, compile):
     if tp == 'acb':
@@ -26,17 +26,27 @@ def make_name(file, tp, compile):
     else:
         raise ValueError(f'Unknown type: {tp}')
 
-def out_acb(p, output_file, level):
+def out_acb(p, output_file, level, compress=True):
     logger.info("Saving...")
-    # 保存并压缩
-    data = pickle.dumps(p.out)
-    data = zstandard.compress(data, level=level)
-
-    with open(output_file, "wb") as of:
-        of.write(b"zstd" + data)
+    # 保存为 v2 格式，不压缩时运行时可以直接映射
+    acb.write(p.out, output_file, compress, level)
     
     
-def asm(file, output_file, include_dir, worker, level, tp, compile, use_gcc, use_clang):
+def asm(
+    file,
+    output_file,
+    include_dir,
+    worker,
+    level,
+    tp,
+    compile,
+    use_gcc,
+    use_clang,
+    compress=True,
+    cache=None,
+    stream=False,
+    chunk_size=CHUNK_SIZE,
+):
     
     # 生成文件名
     if output_file is None:
@@ -56,31 +66,51 @@ def asm(file, output_file, include_dir, worker, level, tp, compile, use_gcc, use
     
     # jinja2渲染
     tmp["inc_dir"] = ["."] + include_dir
+    # include 的解析结果保存在编译缓存中，输出 .acp 时仍展开为源码
+    tmp["cache"] = cache if tp != "acp" else None
 
-    env = jinja2.Environment(
-        loader=jinja2.DictLoader({os.path.basename(file): open(file).read()}),
-        variable_start_string="{",
-        variable_end_string="}",
-        block_start_string="%",
-        block_end_string="%",
-    )
+    # 模板从源文件所在目录和 include 目录加载，编译结果保存在编译缓存中
+    search_path = [os.path.dirname(os.path.abspath(file))] + tmp["inc_dir"]
+    cache_dir = os.path.join(cache.directory, "jinja") if cache is not None else None
+    env = environment(search_path, cache_dir)
 
     f_t = env.get_template(os.path.basename(file))
 
     if tp == 'acp':
         with open(output_file, "w") as of:
-            of.write(f_t.render(**funcs))
+            of.writelines(f_t.generate(**funcs))
         logger.success("Done.")
         return
     
     # 解析
     logger.info("Parsing...")
 
-    p = Parser(f_t.render(**funcs), worker)
-    p.parser()
+    if stream:
+        # 边渲染边解析，不保留完整的展开结果，因此不缓存整个程序
+        p = Parser(f_t.generate(**funcs), worker, chunk_size, cache)
+        data = None
+    else:
+        code = f_t.render(**funcs)
+        p = Parser(code, worker, cache=cache)
+        # include 已经替换为缓存键，展开后的源码相同时整个程序都可以复用
+        key = cache.key("program", code) if cache is not None else None
+        data = cache.get(key) if cache is not None else None
+    if data is not None:
+        logger.info("Using cached program.")
+        p.out = Fragment.loads(data).program
+    else:
+        p.parser()
+        if cache is not None and not stream:
+            cache.put(key, Fragment(p.out).dumps())
+    if cache is not None:
+        stats = cache.stats
+        logger.info(
+            f"Cache: {stats['hits']} hits, {stats['misses']} misses, "
+            f"{stats['evictions']} evictions, {cache.size() / 1024 / 1024:.1f} MB"
+        )
     
     if tp == 'acb':
-        out_acb(p, output_file, level)
+        out_acb(p, output_file, level, compress)
     elif tp == 'cpp':
         t = CppTranslator(p.out, compile, use_gcc, use_clang)
         open(os.path.join(tempfile.gettempdir(),'asim_temp.cpp'), 'w').write(t.render())
@@ -133,11 +163,47 @@ def main():
         default='asb',
         help='Output format'
     )
+    parser.add_argument(
+        "--uncompressed",
+        action="store_true",
+        help="Write an uncompressed .acb that can be memory-mapped.",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not read or write the compile cache.",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=str,
+        default=None,
+        help="Compile cache directory (default: $ASIM_CACHE_DIR or ~/.cache/asim).",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=256,
+        help="Maximum compile cache size in MB.",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Parse the template output while it is being rendered.",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=CHUNK_SIZE,
+        help="Characters per parse chunk in streaming mode.",
+    )
     parser.add_argument("-c", '--compile', action="store_true", help="Use GCC for compilation.")
     parser.add_argument("--use-gcc", action="store_true", help="Use GCC for compilation.")
     parser.add_argument("--use-clang", action="store_true", help="Use Clang for compilation.")
     
     args = parser.parse_args()
+    cache = None
+    if not args.no_cache:
+        cache = DiskCache(args.cache_dir, args.cache_size * 1024 * 1024)
     asm(
         args.file,
         args.output,
@@ -147,7 +213,11 @@ def main():
         args.type,
         args.compile,
         args.use_gcc,
-        args.use_clang
+        args.use_clang,
+        not args.uncompressed,
+        cache,
+        args.stream,
+        args.chunk_size,
     )
 
 
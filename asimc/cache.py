@@ -1,5 +1,9 @@
 from collections import OrderedDict
+import hashlib
+import os
+import tempfile
 import threading
+from asimr.constant import __version__
 
 
 class LRUCache:
@@ -43,3 +47,89 @@ def lru_cache(capacity: int):
         return wrapper
 
     return decorator
+
+
+class DiskCache:
+    """按内容哈希保存编译结果的磁盘缓存
+
+    每个条目是一个文件，最近使用时间记在文件的修改时间上；
+    总大小超过 max_size 字节时先淘汰最久未使用的条目。
+    """
+
+    def __init__(self, directory=None, max_size=256 * 1024 * 1024):
+        if directory is None:
+            directory = os.environ.get("ASIM_CACHE_DIR") or os.path.join(
+                os.path.expanduser("~"), ".cache", "asim"
+            )
+        self.directory = directory
+        self.max_size = max_size
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, *parts) -> str:
+        # 编译器版本也是键的一部分，升级后旧条目自然失效
+        h = hashlib.sha256(__version__.encode())
+        for part in parts:
+            if isinstance(part, str):
+                part = part.encode()
+            h.update(len(part).to_bytes(8, "little"))
+            h.update(part)
+        return h.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + ".entry")
+
+    def read(self, key):
+        # 读取条目，不计入命中统计
+        path = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)  # 标记为最近使用
+        except OSError:
+            return None
+        return data
+
+    def get(self, key):
+        data = self.read(key)
+        self.stats["hits" if data is not None else "misses"] += 1
+        return data
+
+    def put(self, key, data):
+        # 先写临时文件再改名，并发编译不会读到写了一半的条目
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, self.path(key))
+        self.stats["writes"] += 1
+        self.evict()
+
+    def entries(self):
+        """[(最近使用时间, 大小, 路径)]"""
+        result = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(".entry"):
+                    st = entry.stat()
+                    result.append((st.st_mtime, st.st_size, entry.path))
+        return result
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self.stats["evictions"] += 1
+
+    def clear(self):
+        for _, _, path in self.entries():
+            os.remove(path)
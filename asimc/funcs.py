@@ -1,6 +1,7 @@
 import os
 import base64
 from asimr.constant import tmp, SyscallTable
+from asimc.parser import is_compiled, parse_include
 
 
 def str2list(text: str):
@@ -40,12 +41,20 @@ def include(file_name: str):
         raise FileNotFoundError(f"Cannot find file: {file_name}")
 
     with open(file_path, "rb") as f:
-        magic_number = f.read(4).decode()
-        f.seek(0)
-        if magic_number == "zstd":
-            return f".include_zstd {file_path} {base64.b85encode(f.read()).decode()}\n"
-        else:
-            return f".include_file {file_path}\n{f.read().decode()}\n;! end_include {file_path}"
+        data = f.read()
+    compiled = is_compiled(data)  # 编译好的程序
+
+    cache = tmp.get("cache")
+    if cache is not None:
+        key = cache.key("include", data, "\n".join(inc_dirs))
+        if cache.get(key) is None:
+            cache.put(key, parse_include(data, compiled).dumps())
+        return f".include_cached {file_path} {key}\n"
+
+    if compiled:
+        return f".include_zstd {file_path} {base64.b85encode(data).decode()}\n"
+    else:
+        return f".include_file {file_path}\n{data.decode()}\n;! end_include {file_path}"
 
     return ""  # 如果没有找到文件，返回 None 或其他适当的值
 
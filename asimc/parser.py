@@ -1,65 +1,198 @@
 import concurrent.futures
+import json
+import struct
+from collections import deque
+from dataclasses import dataclass, field
 from asimr.constant import InstructionSet, OperandType, Program, GrammarError
 from asimr.core import Instruction, Operand
 from loguru import logger
 from asimc.cache import LRUCache, lru_cache
+from asimr import acb
 import base64
 import zstandard
 import pickle
 
+# 定长编码中三个操作数值的字节偏移，见 Instruction.pack
+VALUE_OFFSETS = (2, 7, 12)
+CHUNK_SIZE = 1024 * 1024  # 流式解析时每块的字符数
+
+
+@dataclass
+class Fragment:
+    """一块源码解析后的可重定位结果，由 link 合并成完整的程序"""
+
+    program: Program  # 标签地址相对于本块的第一条指令
+    # [(指令下标, 操作数位置, 标签, 行号)]
+    relocations: list = field(default_factory=list)
+    config: dict = field(default_factory=dict)  # 本块中设置的配置项
+    register: tuple = None  # 本块设置 n_GPR 之前用到的最大寄存器 (编号, 行号)
+
+    def dumps(self) -> bytes:
+        # 重定位信息用 JSON 保存，程序本身用 .acb v2 格式
+        meta = json.dumps(
+            {
+                "relocations": self.relocations,
+                "config": self.config,
+                "register": self.register,
+            }
+        ).encode()
+        return len(meta).to_bytes(4, "little") + meta + acb.dumps(self.program)
+
+    @classmethod
+    def loads(cls, data) -> "Fragment":
+        size = int.from_bytes(data[:4], "little")
+        meta = json.loads(data[4 : 4 + size])
+        program = acb.loads(data[4 + size :])
+        program.instructions = list(program.instructions)
+        program.lines = list(program.lines)
+        register = meta["register"]
+        return cls(
+            program,
+            [tuple(r) for r in meta["relocations"]],
+            meta["config"],
+            tuple(register) if register is not None else None,
+        )
+
+
+def patch(inst, slot, value):
+    data = bytearray(inst)
+    struct.pack_into("<I", data, VALUE_OFFSETS[slot], value)
+    return bytes(data)
+
+
+def read_compiled(data) -> Program:
+    if acb.is_acb(data):
+        return acb.loads(data)
+    # 旧格式
+    decommpress = zstandard.decompress(data[4:])
+    return pickle.loads(decommpress)
+
+
+def link(fragments) -> Program:
+    """按顺序合并各块，修正标签地址并解析跨块和向前的标签引用"""
+    parser = CodeParser()
+    for fragment in fragments:
+        parser.merge(fragment)
+    parser.resolve()
+    return parser.out
+
+
+def split_source(code: str, parts):
+    """按大小把源码均分为最多 parts 块，只在换行处切分
+
+    返回 [(文本, 第一行的行号)]，块的大小按字符数计算。
+    """
+    chunks = []
+    start, line = 0, 1
+    size = len(code)
+    for i in range(1, parts + 1):
+        end = code.find("\n", max(start, size * i // parts)) if i < parts else -1
+        if end == -1:
+            end = size
+        chunks.append((code[start:end], line))
+        line += code.count("\n", start, end) + 1
+        start = end + 1
+        if start > size:
+            break
+    return chunks
+
+
+def stream_source(pieces, size=CHUNK_SIZE):
+    """把逐段产生的源码（如 Template.generate）按行切成约 size 个字符的块
+
+    与 split_source 一样产出 (文本, 第一行的行号)，同一时刻只保留一块文本。
+    """
+    buffer = []
+    length = 0
+    line = 1
+    for piece in pieces:
+        buffer.append(piece)
+        length += len(piece)
+        if length < size:
+            continue
+        text = "".join(buffer)
+        cut = text.rfind("\n")
+        if cut == -1:  # 还没有完整的一行
+            buffer = [text]
+            continue
+        yield text[:cut], line
+        line += text.count("\n", 0, cut) + 1
+        buffer = [text[cut + 1 :]]
+        length = len(buffer[0])
+    yield "".join(buffer), line
+
+
+def parse_chunk(code: str, first_line=1, cache=None) -> Fragment:
+    # 在工作进程中执行，只传入本块的源码和读取 .include_cached 用的编译缓存
+    parser = CodeParser(first_line, relocatable=True, compile_cache=cache)
+    parser.parser(code.split("\n"))
+    return parser.fragment()
+
+
+def is_compiled(data: bytes):
+    return data[:4] in (b"zstd", acb.MAGIC)
+
+
+def parse_include(data: bytes, compiled) -> Fragment:
+    if compiled:
+        # 与 .include_zstd 一致，只引入指令
+        instructions = list(read_compiled(data).instructions)
+        return Fragment(Program(instructions=instructions))
+    parser = CodeParser(relocatable=True)
+    parser.parser(data.decode().split("\n"))
+    return parser.fragment()
+
 
 class Parser:
-    def __init__(self, code: str, max_worker=1):
+    def __init__(self, code, max_worker=1, chunk_size=CHUNK_SIZE, cache=None):
+        # code 为完整的源码，或逐段产生源码的可迭代对象（流式解析）
         self.code = code
         self.worker = max_worker  # worker数量
+        self.chunk_size = chunk_size  # 流式解析时每块的字符数
+        self.cache = cache  # 编译缓存，随每块一起传给工作进程
         self.out = Program()
 
-    def divide_list(self, lst, num_parts):
-        k, m = divmod(len(lst), num_parts)
-        divided_lists = []
-        start = 0
-        for i in range(num_parts):
-            # 计算每个部分的大小，如果还有剩余元素，则当前部分多分配一个
-            part_size = k + (1 if i < m else 0)
-            # 计算结束索引，确保不会超出列表范围
-            end = start + part_size
-            # 将子列表添加到结果列表中
-            divided_lists.append(lst[start:end])
-            # 更新下一个部分的起始索引
-            start = end
-        return divided_lists
-
-    def parser(self):
-        lines = self.code.split("\n")
-        num_processes = min(self.worker, len(lines))  # 可以根据实际情况调整进程数
+    def chunks(self):
+        if isinstance(self.code, str):
+            return split_source(self.code, max(self.worker, 1))
+        return stream_source(self.code, self.chunk_size)
 
-        futures = []
+    def fragments(self):
+        # 按源码顺序产出各块的解析结果
+        if self.worker <= 1:
+            for chunk in self.chunks():
+                yield parse_chunk(*chunk, self.cache)
+            return
         with concurrent.futures.ProcessPoolExecutor(
-            max_workers=num_processes
+            max_workers=self.worker
         ) as executor:
-            for n, part in enumerate(self.divide_list(lines, num_processes)):
-                futures.append(executor.submit(self.handler, part, n))
-
-        results = []
-        for future in futures:
-            out, n = future.result()
-            results.append((out, n))
+            # 最多同时提交 2 倍 worker 数的块，渲染不会远远领先于解析
+            pending = deque()
+            for chunk in self.chunks():
+                if len(pending) >= self.worker * 2:
+                    yield pending.popleft().result()
+                pending.append(executor.submit(parse_chunk, *chunk, self.cache))
+            while pending:
+                yield pending.popleft().result()
 
-        results = sorted(results, key=lambda x: x[1])
-        for out, n in results:
-            self.out = self.out + out
-
-    def handler(self, code, n):
-        parser = CodeParser()
-        parser.parser(code)
-        return parser.out, n
+    def parser(self):
+        self.out = link(self.fragments())
 
 
 class CodeParser:
-    def __init__(self):
+    def __init__(self, first_line=1, relocatable=False, compile_cache=None):
         self.line = 0  # 行计数器
+        self.first_line = first_line  # 第一行在源码中的行号
+        self.lineno = first_line  # 当前行在源码中的行号
         self.out = Program()  # 程序对象
         self.cache = LRUCache(128)  # 缓存
+        # 可重定位时所有标签引用都留给 link 解析，否则只有向前引用留到最后
+        self.relocatable = relocatable
+        self.relocations = []  # [(指令下标, 操作数位置, 标签, 行号)]
+        self.unresolved = []  # 当前行中尚未解析的标签引用 [(操作数位置, 标签)]
+        self.config = {}  # 本次解析中设置的配置项
+        self.register = None  # 设置 n_GPR 之前用到的最大寄存器 (编号, 行号)
+        self.compile_cache = compile_cache  # .include_cached 引用的编译缓存
 
     def find_inst(self, name: str):  # 解析操作码
         name = name.upper()
@@ -69,29 +202,25 @@ class CodeParser:
             )
         return InstructionSet[name]
 
+    def set_config(self, key, value):
+        logger.debug(f"Set {key} to {value}")
+        setattr(self.out, key, int(value))
+        self.config[key] = int(value)
+
     def config_inst(self, line_l):
         if len(line_l) < 1:
             return
-        if line_l[0] == ".data_mem":
-            logger.debug(f"Set data_mem to {line_l[1]}")
-            self.out.data_mem = int(line_l[1])
-
-        elif line_l[0] == ".n_GPR":
-            logger.debug(f"Set n_GPR to {line_l[1]}")
-            self.out.n_GPR = int(line_l[1])
-
-        elif line_l[0] == ".stack_size":
-            logger.debug(f"Set stack_size to {line_l[1]}")
-            self.out.stack_size = int(line_l[1])
-
-        elif line_l[0] == ".inst_mem":
-            logger.debug(f"Set inst_mem to {line_l[1]}")
-            self.out.inst_mem = int(line_l[1])
+        if line_l[0] in (".data_mem", ".n_GPR", ".stack_size", ".inst_mem"):
+            self.set_config(line_l[0][1:], line_l[1])
 
         elif line_l[0] == ".include_zstd":
             logger.debug(f"Importing a precompiled file: {line_l[1]}")
             self.inc_zstd(line_l)
 
+        elif line_l[0] == ".include_cached":
+            logger.debug(f"Importing a cached file: {' '.join(line_l[1:-1])}")
+            self.inc_cached(line_l)
+
         elif line_l[0] == ".include_file":
             logger.debug(f"Importing a file: {line_l[1]}")
         else:
@@ -100,12 +229,60 @@ class CodeParser:
             )
 
     def inc_zstd(self, line_l):
-        data = base64.b85decode(line_l[2])
-        decommpress = zstandard.decompress(data[4:])
-        obj = pickle.loads(decommpress)
-        self.out.instructions += obj.instructions
+        obj = read_compiled(base64.b85decode(line_l[2]))
+        self.out.instructions += list(obj.instructions)
+        # 预编译文件中的指令都对应到 include 所在的行
+        self.out.lines += [self.lineno] * len(obj.instructions)
+
+    def inc_cached(self, line_l):
+        # 编译缓存中的 include 结果，指令都对应到 include 所在的行
+        path = " ".join(line_l[1:-1])
+        cache = self.compile_cache
+        data = cache.read(line_l[-1]) if cache is not None else None
+        if data is not None:
+            fragment = Fragment.loads(data)
+        else:
+            # 条目已被淘汰（或没有缓存）时重新解析被引入的文件
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+            except OSError:
+                raise GrammarError(f"Cannot find file: {path}", {"Line": self.line})
+            fragment = parse_include(data, is_compiled(data))
+        self.merge(fragment, self.lineno)
+        self.out.include_file.append(path)
+
+    def merge(self, fragment: Fragment, lineno=None):
+        """把另一块的解析结果接在当前程序之后，lineno 不为 None 时指令都对应到该行"""
+        out = self.out
+        base = len(out.instructions)
+        program = fragment.program
+        register = fragment.register
+        if register is not None:
+            if self.relocatable and "n_GPR" not in self.config:
+                if self.register is None or register[0] > self.register[0]:
+                    self.register = register
+            elif register[0] >= out.n_GPR:
+                raise GrammarError(
+                    f"Invalid register: r_{register[0]}", {"Line": register[1]}
+                )
+        for name, pc in program.labels.items():
+            if name in out.labels:
+                raise GrammarError(f"Duplicate label: {name}", {"Line": self.line})
+            out.labels[name] = pc + base
+        self.relocations += [(i + base, *rest) for i, *rest in fragment.relocations]
+        out.instructions += program.instructions
+        if lineno is None:
+            out.lines += program.lines
+        else:
+            out.lines += [lineno] * len(program.instructions)
+        out.include_file += program.include_file
+        for key, value in fragment.config.items():
+            setattr(out, key, value)
+        self.config.update(fragment.config)
 
     def parsern_operand(self, operands):
+        slot = 0  # 操作数在指令中的位置
         for i in range(0, 3):
             if i >= len(operands):
                 break
@@ -128,7 +305,11 @@ class CodeParser:
                 if value.isdigit():
                     value = int(value)
 
-                    if value >= self.out.n_GPR:
+                    if self.relocatable and "n_GPR" not in self.config:
+                        # 寄存器数量可能由前面的块设置，留给 link 检查
+                        if self.register is None or value > self.register[0]:
+                            self.register = (value, self.lineno)
+                    elif value >= self.out.n_GPR:
                         raise GrammarError(
                             f"Invalid register: {op}", {"Line": self.line}
                         )
@@ -151,20 +332,22 @@ class CodeParser:
                 type = OperandType.Number
                 n = self.out.labels.get(op[1:], -1)
 
-                if n != -1:
+                if n != -1 and not self.relocatable:
                     value = n
                 else:
-                    raise GrammarError(
-                        f"Label that does not exist: {op[1:]}", {"Line": self.line}
-                    )
+                    # 先填 0，地址在标签定义之后或 link 时补上
+                    value = 0
+                    self.unresolved.append((slot, op[1:]))
 
             else:
                 raise GrammarError(f"Incorrect operand type: {op}", {"Line": self.line})
 
             yield Operand(value, type)
+            slot += 1
 
     def parser_l(self, line: str):
-        line = line.split(";")[0]  # 去除行尾注释
+        if not line.startswith(".include_zstd"):  # base85 数据中可能含有分号
+            line = line.split(";")[0]  # 去除行尾注释
 
         line_l = line.split(" ")
 
@@ -193,7 +376,8 @@ class CodeParser:
             return inst.pack()
 
     def parser(self, code):
-        for l in code:
+        for lineno, l in enumerate(code, self.first_line):
+            self.lineno = lineno
             l = l.strip()
 
             if l == "":  # 处理空行
@@ -203,13 +387,35 @@ class CodeParser:
 
             if res == -1:  # 缓存未命中时才执行解析
                 result = self.parser_l(l)
+                if self.unresolved:
+                    # 含有未解析标签的行不缓存，每次都要记录重定位
+                    index = len(self.out.instructions)
+                    for slot, name in self.unresolved:
+                        self.relocations.append((index, slot, name, lineno))
+                    self.unresolved = []
                 # 在放入缓存前检查result的有效性，避免存储无效结果
-                if result:
+                elif result:
                     self.cache.put(l, result)
             else:
                 result = res
 
             if result:
                 self.out.instructions.append(result)
+                self.out.lines.append(lineno)
 
             self.line += 1
+
+        if not self.relocatable:
+            self.resolve()
+
+    def resolve(self):
+        # 补上向前引用的标签地址
+        labels, instructions = self.out.labels, self.out.instructions
+        for index, slot, name, line in self.relocations:
+            if name not in labels:
+                raise GrammarError(f"Label that does not exist: {name}", {"Line": line})
+            instructions[index] = patch(instructions[index], slot, labels[name])
+        self.relocations = []
+
+    def fragment(self) -> Fragment:
+        return Fragment(self.out, self.relocations, self.config, self.register)
@@ -0,0 +1,38 @@
+import os
+from hashlib import sha1
+import jinja2
+from asimr.constant import __version__
+
+# 预处理器使用的定界符
+DELIMITERS = {
+    "variable_start_string": "{",
+    "variable_end_string": "}",
+    "block_start_string": "%",
+    "block_end_string": "%",
+}
+
+
+class BytecodeCache(jinja2.FileSystemBytecodeCache):
+    """Jinja 字节码缓存，键中包含定界符，定界符不同的环境不会共用编译结果"""
+
+    def __init__(self, directory, delimiters=DELIMITERS):
+        os.makedirs(directory, exist_ok=True)
+        super().__init__(directory)
+        self.delimiters = repr(sorted(delimiters.items()))
+
+    def get_cache_key(self, name, filename=None):
+        key = super().get_cache_key(name, filename)
+        return sha1(f"{key}|{self.delimiters}|{__version__}".encode()).hexdigest()
+
+
+def environment(search_path, cache_dir=None) -> jinja2.Environment:
+    """创建预处理器的模板环境
+
+    模板和 % include %、% import % 引入的文件都从 search_path 中查找；
+    给出 cache_dir 时编译后的模板保存在其中，下次编译直接加载。
+    """
+    return jinja2.Environment(
+        loader=jinja2.FileSystemLoader(search_path),
+        bytecode_cache=BytecodeCache(cache_dir) if cache_dir is not None else None,
+        **DELIMITERS,
+    )
@@ -4,6 +4,7 @@
 #include <vector>
 #include <stdexcept>
 #include <string>
+#include <cstring>
 
 // 使用模板定义一个带最大容量限制的栈
 template <typename T>
@@ -55,7 +56,7 @@ public:
 struct Register {
     unsigned short* gpr;
     unsigned int pc = 0;      // 程序计数器
-    unsigned int sr = 0;      // 状态寄存器
+    int sr = 0;               // 状态寄存器，有符号，MEMCMP 可能写入 -1
     unsigned int tc = 0;      // 时间计数器
 
     Register(int size) {
@@ -94,6 +95,30 @@ public:
         memory[address] = value;
     }
 
+    // 检查整个区间后返回其起始指针
+    char* block(size_t address, size_t length) {
+        if (address > memory.size() || length > memory.size() - address) {
+            throw std::out_of_range("Address out of range");
+        }
+        return memory.data() + address;
+    }
+
+    // 复制内存块，源和目标可以重叠
+    void move(size_t source, size_t target, size_t length) {
+        std::memmove(block(target, length), block(source, length), length);
+    }
+
+    // 用同一个字节填充内存块
+    void fill(size_t address, unsigned char value, size_t length) {
+        std::memset(block(address, length), value, length);
+    }
+
+    // 比较两个内存块，返回 -1、0 或 1
+    int compare(size_t a, size_t b, size_t length) {
+        int result = std::memcmp(block(a, length), block(b, length), length);
+        return (result > 0) - (result < 0);
+    }
+
     // 获取内存大小
     size_t getSize() const {
         return memory.size();
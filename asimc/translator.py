@@ -1,6 +1,6 @@
 import subprocess
-from asimr.constant import Program
-from asimr.core import Instruction
+from asimr.constant import Program, OperandType, InstructionSet
+from asimr.decode import columns, build, tolist
 from jinja2 import Environment, FileSystemLoader
 import os
 import tempfile
@@ -43,15 +43,13 @@ class CppTranslator:
         raise Exception("No suitable compiler found.")
 
     def render(self):
-        for inst in self.p.instructions:
-            inst = Instruction.unpack(inst)
-
-            name = inst.opcode.name
-            if hasattr(self, "inst_" + name):
-                func = getattr(self, "inst_" + name)
-                self.items.append(func(inst))
-            else:
+        # 先在操作码列上检查是否有不支持的指令，再逐条生成代码
+        cols = columns(self.p.instructions)
+        for opcode in set(tolist(cols.opcode)):
+            if not hasattr(self, "inst_" + InstructionSet(opcode).name):
                 raise TypeError("Unsupported instruction")
+        for inst in build(cols):
+            self.items.append(getattr(self, "inst_" + inst.opcode.name)(inst))
 
         env = Environment(
             loader=FileSystemLoader(
@@ -78,5 +76,39 @@ class CppTranslator:
             with open(output, 'w') as f:
                 f.write(open(path).read())
             
+    def value(self, operand):
+        if operand.type == OperandType.Register:
+            return f"asim_reg.gpr[{operand.value}]"
+        elif operand.type == OperandType.Memory:
+            return f"asim_mem.read({operand.value})"
+        return str(operand.value)
+
+    def address(self, operand):
+        # 内存操作数取其地址，寄存器和立即数取其值
+        if operand.type == OperandType.Memory:
+            return str(operand.value)
+        return self.value(operand)
+
     def inst_PNC(self, inst):
         return 'cout << "666" << endl;'
+
+    def inst_MEMCPY(self, inst):
+        return "asim_mem.move({}, {}, {});".format(
+            self.address(inst.source),
+            self.address(inst.target),
+            self.value(inst.parameter),
+        )
+
+    def inst_MEMSET(self, inst):
+        return "asim_mem.fill({}, {}, {});".format(
+            self.address(inst.target),
+            self.value(inst.source),
+            self.value(inst.parameter),
+        )
+
+    def inst_MEMCMP(self, inst):
+        return "asim_reg.sr = asim_mem.compare({}, {}, {});".format(
+            self.address(inst.source),
+            self.address(inst.target),
+            self.value(inst.parameter),
+        )
@@ -1,34 +1,194 @@
 import argparse
-import pickle
-import zstandard
+import asyncio
+import atexit
+import functools
+import sys
 from asimr.core import Core, Instruction
-from asimr.device import Register, Memory, Stack
-from asimr.constant import Program
+from asimr.jit import JIT
+from asimr.fusion import PairProfile, load_pairs, select
+from asimr.profiler import Profile
+from asimr.scheduler import Scheduler
+from asimr.device import Register, Memory, InstructionMemory, Stack, Console
+from asimr.constant import Program, Status
+from asimr.loader import read_program
+from asimr import acb
+from asimr.snapshot import is_snapshot, restore
 
 
-def run(file):
-    with open(file, "rb") as f:
-        data = f.read()
-        data = zstandard.decompress(data[4:])
-        obj: Program = pickle.loads(data)
+def load(file, console):
+    # 压缩的 v2 程序边解压边执行，不必等整个文件解码完
+    chunks = None
+    if acb.is_compressed(file):
+        obj, chunks = acb.stream(file)
+    else:
+        obj: Program = read_program(file)
 
     register = Register(obj.n_GPR)
     data_mem = Memory(obj.data_mem)
-    inst_mem = Memory(obj.inst_mem, strict=False)
+    inst_mem = InstructionMemory(obj.inst_mem)
     stack = Stack(obj.stack_size)
+    cpu = Core(register, data_mem, inst_mem, stack, console)
+    if chunks is not None:
+        cpu.stream(chunks)
+    else:
+        cpu.load(obj.instructions)
+    return cpu, obj
 
-    cpu = Core(register, data_mem, inst_mem, stack)
-    for i, inst in enumerate(obj.instructions):
-        cpu.instruction_memory.write(i, inst)
-    cpu.run()
+
+def run(
+    file,
+    jit=False,
+    pair_stats=None,
+    fuse=None,
+    buffer_size=8192,
+    snapshot_file=None,
+    profile_file=None,
+):
+    console = Console(buffer_size)
+    atexit.register(console.flush)
+
+    if is_snapshot(file):
+        cpu, obj = restore(file, console)
+    else:
+        cpu, obj = load(file, console)
+    cpu.snapshot_file = snapshot_file
+    cpu.info = obj
+    if fuse and not profile_file:
+        # 超级指令会把两条指令合并计数，剖析时不融合
+        cpu.fuse(select(load_pairs(fuse)))
+
+    profile = output = None
+    if profile_file:
+        cpu.pull()  # 流式加载的行号表在读完全部指令后才可用
+        profile, output = Profile(obj), profile_file
+    elif pair_stats:
+        profile, output = PairProfile(), pair_stats
+
+    if profile is not None:
+        execute = functools.partial(profile.run, cpu)
+    elif jit:
+        execute = JIT(cpu).run
+    else:
+        execute = cpu.run
+    try:
+        if execute() == Status.BLOCKED:
+            # 等待网络 I/O 时改由事件循环驱动，仍使用同一个执行循环
+            asyncio.run(resume(cpu, execute))
+    finally:
+        if profile is not None:
+            profile.save(output)
+    return cpu.exit_code
+
+
+async def resume(cpu, execute):
+    # 重新执行阻塞的系统调用，直到程序停机
+    while True:
+        if cpu.pending is not None:
+            await asyncio.wait([cpu.pending])
+        if execute() != Status.BLOCKED:
+            return
+        if cpu.pending is None:
+            await asyncio.sleep(0.001)
+
+
+def schedule(files, quantum=1000, buffer_size=8192):
+    # 在同一个进程中轮转执行多个程序，每个程序有独立的寄存器、内存和栈
+    scheduler = Scheduler(quantum)
+    for file in files:
+        console = Console(buffer_size)
+        atexit.register(console.flush)
+        if is_snapshot(file):
+            cpu, _ = restore(file, console)
+        else:
+            cpu, _ = load(file, console)
+        scheduler.add(cpu, file)
+
+    for name, s in asyncio.run(scheduler.run_async()).items():
+        line = f"{name}: {s['status']}, {s['instructions']} instructions"
+        if s["error"]:
+            line += f", {s['error']}"
+        sys.stderr.write(line + "\n")
 
 
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        from asimr.batch import main as batch_main
+
+        return batch_main(sys.argv[2:])
+
     parser = argparse.ArgumentParser(description="Run an assembly file.")
-    parser.add_argument("file", type=str, help="The path to the assembly file to run.")
+    parser.add_argument(
+        "file",
+        type=str,
+        nargs="+",
+        help="The path to the assembly file or snapshot to run. "
+        "Several files are run together in one process.",
+    )
+    parser.add_argument(
+        "--jit", action="store_true", help="Compile hot basic blocks to Python."
+    )
+    parser.add_argument(
+        "--pair-stats",
+        type=str,
+        default=None,
+        help="Record opcode pair frequencies to this file.",
+    )
+    parser.add_argument(
+        "--fuse",
+        type=str,
+        default=None,
+        help="Fuse the most frequent opcode pairs recorded in this file.",
+    )
+    parser.add_argument(
+        "--buffer-size",
+        type=int,
+        default=8192,
+        help="Size of the console output buffer in characters.",
+    )
+    parser.add_argument(
+        "--unbuffered",
+        action="store_true",
+        help="Write console output immediately.",
+    )
+    parser.add_argument(
+        "--snapshot",
+        type=str,
+        default=None,
+        help="File written when the program calls the snapshot syscall.",
+    )
+    parser.add_argument(
+        "--profile",
+        type=str,
+        default=None,
+        help="Record per-opcode, per-PC and per-call execution counts to this file. "
+        "Line numbers refer to the rendered source (asimc -t acp), not the template.",
+    )
+    parser.add_argument(
+        "--quantum",
+        type=int,
+        default=1000,
+        help="Instructions each program runs per turn when running several files.",
+    )
     args = parser.parse_args()
-    run(args.file)
+    buffer_size = 0 if args.unbuffered else args.buffer_size
+    if len(args.file) > 1:
+        if args.jit or args.profile or args.pair_stats or args.fuse or args.snapshot:
+            parser.error(
+                "--jit, --profile, --pair-stats, --fuse and --snapshot "
+                "only work with a single file"
+            )
+        return schedule(args.file, args.quantum, buffer_size)
+    # HALT 或 exit 系统调用给出的退出码作为进程的退出码
+    return run(
+        args.file[0],
+        args.jit,
+        args.pair_stats,
+        args.fuse,
+        buffer_size,
+        args.snapshot,
+        args.profile,
+    )
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,205 @@
+import json
+import mmap
+import struct
+import sys
+from array import array
+from collections.abc import Sequence
+import zstandard
+from asimr.constant import Program, ASIMError
+from asimr.core import Instruction, INSTRUCTION_SIZE as SLOT
+
+MAGIC = b"ACB2"
+VERSION = 2
+# 魔数, 版本, 标志, n_GPR, stack_size, data_mem, inst_mem, 编译时间, 指令数, 元数据长度, 保留
+HEADER = struct.Struct("<4sHHIIIIQIIQ")
+CHUNK = 4096  # 流式读取时每块的指令数
+
+COMPRESSED = 0x1  # 头部之后的内容经过 zstd 压缩
+LINES = 0x2  # 包含行号表
+
+
+def align(n):
+    return (n + SLOT - 1) // SLOT * SLOT
+
+
+class InstructionTable(Sequence):
+    """定长指令表的只读视图，第 pc 条指令位于 pc * SLOT 处"""
+
+    def __init__(self, buffer, count):
+        self.buffer = memoryview(buffer)
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.count))]
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("instruction index out of range")
+        return bytes(self.buffer[index * SLOT : (index + 1) * SLOT])
+
+    def __reduce__(self):
+        # 内存映射不能序列化，传给其他进程时复制为普通列表
+        return (list, (list(self),))
+
+
+def dumps(program: Program, compress=True, level=5):
+    meta = json.dumps(
+        {"labels": program.labels, "include_file": program.include_file}
+    ).encode()
+    body = bytearray(meta)
+    body += b"\x00" * (align(len(body)) - len(body))
+    for inst in program.instructions:
+        if len(inst) != SLOT:  # 旧的变长编码转为定长编码
+            inst = Instruction.unpack(inst).pack()
+        body += inst
+
+    flags = 0
+    lines = getattr(program, "lines", [])
+    if len(lines) == len(program.instructions) and lines:
+        table = array("I", lines)
+        if sys.byteorder == "big":
+            table.byteswap()
+        body += table.tobytes()
+        flags |= LINES
+    if compress:
+        body = zstandard.compress(bytes(body), level=level)
+        flags |= COMPRESSED
+
+    header = HEADER.pack(
+        MAGIC,
+        VERSION,
+        flags,
+        program.n_GPR,
+        program.stack_size,
+        program.data_mem,
+        program.inst_mem,
+        program.compilation_time,
+        len(program.instructions),
+        len(meta),
+        0,
+    )
+    return header + bytes(body)
+
+
+def write(program: Program, file, compress=True, level=5):
+    with open(file, "wb") as f:
+        f.write(dumps(program, compress, level))
+
+
+def make_program(header, meta):
+    # 由头部和元数据创建不含指令的 Program
+    _, version, _, n_GPR, stack_size, data_mem, inst_mem, ctime, _, _, _ = header
+    if version != VERSION:
+        raise ASIMError("Unsupported program version", {"Version": version})
+    meta = json.loads(bytes(meta))
+    return Program(
+        data_mem=data_mem,
+        inst_mem=inst_mem,
+        n_GPR=n_GPR,
+        stack_size=stack_size,
+        labels=meta["labels"],
+        include_file=meta["include_file"],
+        compilation_time=ctime,
+        lines=array("I"),
+    )
+
+
+def parse(header, body):
+    """header 为解包后的头部，body 为头部之后（已解压）的内容"""
+    flags, count, size = header[2], header[8], header[9]
+    program = make_program(header, body[:size])
+    start = align(size)
+    end = start + count * SLOT
+    if len(body) < end:
+        raise ASIMError("Truncated program", {"Instructions": count})
+    program.instructions = InstructionTable(body[start:end], count)
+
+    if flags & LINES:
+        program.lines.frombytes(body[end : end + count * 4])
+        if sys.byteorder == "big":
+            program.lines.byteswap()
+    return program
+
+
+def loads(data) -> Program:
+    data = memoryview(data)
+    header = HEADER.unpack(data[: HEADER.size])
+    if header[0] != MAGIC:
+        raise ASIMError("Invalid program file")
+    body = data[HEADER.size :]
+    if header[2] & COMPRESSED:
+        body = memoryview(zstandard.decompress(body))
+    return parse(header, body)
+
+
+def load(file) -> Program:
+    """读取 v2 程序文件，未压缩的文件直接映射，不复制指令表"""
+    with open(file, "rb") as f:
+        header = HEADER.unpack(f.read(HEADER.size))
+        if header[0] != MAGIC:
+            raise ASIMError("Invalid program file", {"File": file})
+        if header[2] & COMPRESSED:
+            return parse(header, memoryview(zstandard.decompress(f.read())))
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return parse(header, memoryview(data)[HEADER.size :])
+
+
+def read_exact(reader, n):
+    data = bytearray()
+    while len(data) < n:
+        part = reader.read(n - len(data))
+        if not part:
+            raise ASIMError("Truncated program", {"Expected": n, "Read": len(data)})
+        data += part
+    return data
+
+
+def stream(file, chunk=CHUNK):
+    """边解压边读取程序，返回 (Program, 指令块迭代器)
+
+    返回的 Program 不含指令，指令按块从迭代器产出；读完后才填入行号表。
+    同一时刻只保留一块解压后的数据。
+    """
+    f = open(file, "rb")
+    try:
+        header = HEADER.unpack(read_exact(f, HEADER.size))
+        if header[0] != MAGIC:
+            raise ASIMError("Invalid program file", {"File": file})
+        reader = f
+        if header[2] & COMPRESSED:
+            reader = zstandard.ZstdDecompressor().stream_reader(f)
+        size = header[9]
+        program = make_program(header, read_exact(reader, align(size))[:size])
+    except BaseException:
+        f.close()
+        raise
+
+    def chunks():
+        count = header[8]
+        try:
+            for start in range(0, count, chunk):
+                n = min(chunk, count - start)
+                data = read_exact(reader, n * SLOT)
+                yield [bytes(data[i : i + SLOT]) for i in range(0, n * SLOT, SLOT)]
+            if header[2] & LINES:
+                program.lines.frombytes(read_exact(reader, count * 4))
+                if sys.byteorder == "big":
+                    program.lines.byteswap()
+        finally:
+            f.close()
+
+    return program, chunks()
+
+
+def is_compressed(file):
+    with open(file, "rb") as f:
+        data = f.read(HEADER.size)
+    return len(data) == HEADER.size and is_acb(data) and bool(data[6] & COMPRESSED)
+
+
+def is_acb(data):
+    return bytes(data[: len(MAGIC)]) == MAGIC
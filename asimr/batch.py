@@ -0,0 +1,131 @@
+import argparse
+import concurrent.futures
+import io
+import json
+import multiprocessing
+import os
+import sys
+import time
+from asimr.core import Core
+from asimr.decode import columns, memory_range
+from asimr.device import Register, Memory, InstructionMemory, Stack, Console
+from asimr.constant import Status
+from asimr.loader import read_program
+
+worker = None  # 每个工作进程里复用的 Core
+
+# Core.run 返回的状态 -> 结果中的 status；工作进程中没有事件循环，
+# 等待网络 I/O 的程序不会被恢复，报告为 blocked
+STATUS = {Status.HALTED: "halt", Status.BLOCKED: "blocked"}
+
+
+def init_worker(program, cols, span):
+    # 程序只在启动工作进程时传递一次，各进程各自链接处理函数
+    global worker
+    register = Register(program.n_GPR)
+    data_mem = Memory(program.data_mem)
+    inst_mem = InstructionMemory(program.inst_mem)
+    stack = Stack(program.stack_size)
+    worker = Core(register, data_mem, inst_mem, stack, Console())
+    worker.load(program.instructions, cols, span)
+
+
+def run_one(item):
+    index, case = item
+    cpu = worker
+    cpu.reset()
+    out = io.StringIO()
+    cpu.console.stream = out
+
+    for n, value in case.get("registers", {}).items():
+        cpu.register.set(int(n.removeprefix("r_")), value)
+    for address, values in case.get("memory", {}).items():
+        cpu.memory.write_block(int(address, 0), values)
+
+    result = {"index": index}
+    start = time.perf_counter()
+    try:
+        result["status"] = STATUS[cpu.run()]
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = str(e) or type(e).__name__
+    finally:
+        cpu.shutdown()  # 阻塞时 run 不关闭套接字
+    elapsed = time.perf_counter() - start
+
+    register = cpu.register
+    result["output"] = out.getvalue()
+    result["exit_code"] = cpu.exit_code
+    result["registers"] = register._GPR[:]
+    result["pc"] = register.pc
+    result["tc"] = register.tc
+    result["memory"] = {
+        str(address): list(cpu.memory.read_block(address, length))
+        for address, length in case.get("excerpt", [])
+    }
+    result["worker"] = os.getpid()
+    result["time"] = elapsed
+    return result
+
+
+def read_inputs(file):
+    with open(file) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def batch(file, inputs, jobs=None, chunksize=16):
+    """用同一个程序并行处理多组输入，按输入顺序逐个产出结果"""
+    program = read_program(file)
+    cols = columns(program.instructions)
+    context = multiprocessing.get_context("fork" if os.name == "posix" else None)
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=jobs,
+        mp_context=context,
+        initializer=init_worker,
+        initargs=(program, cols, memory_range(cols)),
+    ) as executor:
+        yield from executor.map(run_one, enumerate(inputs), chunksize=chunksize)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="asimr batch", description="Run one program against many inputs."
+    )
+    parser.add_argument("file", type=str, help="The compiled program to run.")
+    parser.add_argument(
+        "inputs", type=str, help="JSON Lines file with one input per line."
+    )
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=None, help="Number of worker processes."
+    )
+    parser.add_argument(
+        "-o", "--output", type=str, default=None, help="The path to the output file."
+    )
+    args = parser.parse_args(argv)
+
+    out = open(args.output, "w") if args.output else sys.stdout
+    stats = {}
+    start = time.perf_counter()
+    try:
+        for result in batch(args.file, read_inputs(args.inputs), args.jobs):
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+            s = stats.setdefault(result["worker"], [0, 0, 0.0])
+            s[0] += 1
+            s[1] += result["tc"]
+            s[2] += result["time"]
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    # 各工作进程的吞吐量
+    for pid, (runs, instructions, seconds) in sorted(stats.items()):
+        rate = instructions / seconds if seconds else 0
+        sys.stderr.write(
+            f"worker {pid}: {runs} runs, {instructions} instructions, "
+            f"{rate:.0f} ins/s\n"
+        )
+    sys.stderr.write(f"total: {time.perf_counter() - start:.3f}s\n")
@@ -49,6 +49,21 @@ class InstructionSet(Enum):
     PNC = auto()  # 打印数字
     PAC = auto()  # 打印ASCII码
 
+    VLEN = auto()  # 设置向量长度
+    VADD = auto()  # 向量加法
+    VSUB = auto()  # 向量减法
+    VMUL = auto()  # 向量乘法
+    VAND = auto()  # 向量与操作
+    VXOR = auto()  # 向量异或操作
+    VSUM = auto()  # 向量求和
+    VMIN = auto()  # 向量最小值
+    VMAX = auto()  # 向量最大值
+    VCMP = auto()  # 向量比较，相等处为 1
+
+    MEMCPY = auto()  # 复制内存块
+    MEMSET = auto()  # 填充内存块
+    MEMCMP = auto()  # 比较内存块，结果写入状态寄存器
+
 
 class OperandType(Enum):
     Memory = 0x0
@@ -60,7 +75,7 @@ class SyscallTable(Enum):
     read = auto()  # TODO: 读流
     write = auto()  # TODO: 写流
     get_pid = auto()  # TODO: 获取PID
-    exit = auto()  # TODO: 关机(主机)
+    exit = auto()  # 以指定的退出码停机
     getcwd = auto()  # TODO: 获取当前目录
     chdir = auto()  # TODO: 切换目录
     rename = auto()  # TODO: 重命名
@@ -76,6 +91,8 @@ class SyscallTable(Enum):
     send = auto()  # TODO: 发送数据
     close = auto()  # TODO: 关闭
     recv = auto()  # TODO: 接受数据
+    flush = auto()  # 刷新输出缓冲区
+    snapshot = auto()  # 保存虚拟机快照
 
 
 @dataclass
@@ -88,6 +105,7 @@ class Program:
     labels: dict[str, int] = field(default_factory=dict)
     include_file: list[str] = field(default_factory=list)
     compilation_time: int = int(time.time())
+    lines: list[int] = field(default_factory=list)  # 每条指令对应的源码行号
 
     def __add__(self, other: "Program") -> "Program":
         if not isinstance(other, Program):
@@ -100,6 +118,7 @@ class Program:
         self.stack_size = other.stack_size
         self.labels.update(other.labels)
         self.include_file = self.include_file + other.include_file
+        self.lines = self.lines + other.lines
         return self
 
 
@@ -134,4 +153,25 @@ class GrammarError(ASIMError):
     pass
 
 
+class Halt(Exception):
+    # HALT 指令或 exit 系统调用触发的停机信号，由 Core 捕获后正常关机
+    def __init__(self, code=0):
+        super().__init__(code)
+        self.code = code  # 退出码
+
+
+class Blocked(Exception):
+    # 指令暂时无法完成（如等待 I/O），pc 保持不变，之后重新执行该指令
+    def __init__(self, ready=None):
+        super().__init__()
+        self.ready = ready  # 返回 True 时可以重试，为 None 时随时可以重试
+
+
+class Status(Enum):
+    READY = auto()  # 时间片用完，可以继续执行
+    BLOCKED = auto()  # 等待 I/O
+    HALTED = auto()  # 已停机
+    ERROR = auto()  # 执行出错
+
+
 tmp = {}
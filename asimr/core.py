@@ -1,131 +1,158 @@
-from asimr.constant import InstructionSet, OperandType, CPUError
+from asimr.constant import InstructionSet, OperandType, CPUError, Halt, Blocked, Status
 import asimr.instruction as instruction
-from asimr.device import Memory, Register, Stack
-
-
-class Operand:
-    def __init__(self, n, type):
-        if not isinstance(type, OperandType):
-            raise ValueError("type must is OperandType")
-        self.value = n
-        self.type = type
-
-    def __str__(self):
-        return f"Operand({self.value}, {self.type.name})"
-
-    def __repr__(self):
-        return self.__str__()
-
-
-class Instruction:
-    def __init__(
-        self, opcode: InstructionSet, source=None, target=None, parameter=None
-    ):
-        self.opcode = opcode
-        self.source = source
-        self.target = target
-        self.parameter = parameter
-
-    def pack(self, to_int=False):
-        data = self.opcode.value.to_bytes(1, byteorder="little")  # 1字节
-        if self.source:
-            source_type = self.source.type.value.to_bytes(
-                1, byteorder="little"
-            )  # 1字节
-            source_address = self.source.value.to_bytes(4, byteorder="little")  # 4字节
-
-            data += source_type + source_address
-        else:
-            pass
-            # data += b"\x00\x00\x00\x00\x00"
-
-        if self.target:
-            target_type = self.target.type.value.to_bytes(
-                1, byteorder="little"
-            )  # 1字节
-            target_address = self.target.value.to_bytes(4, byteorder="little")  # 4字节
-
-            data += target_type + target_address
-        else:
-            pass
-            # data += b"\x00\x00\x00\x00\x00"
-
-        if self.parameter:
-            parameter_type = self.parameter.type.value.to_bytes(
-                1, byteorder="little"
-            )  # 1字节
-            parameter_value = self.parameter.value.to_bytes(
-                4, byteorder="little"
-            )  # 4字节
-
-            data += parameter_type + parameter_value
-        else:
-            pass
-            # data += b"\x00\x00\x00\x00\x00"
-
-        if to_int:
-            return int.from_bytes(data, byteorder="little")
-        else:
-            return data
-
-    @classmethod
-    def unpack(cls, data, from_int=False):
-        if from_int:
-            data = data.to_bytes(16, byteorder="little")
-
-        if type(data) == int:
-            return cls(InstructionSet.HALT)
-
-        opcode = InstructionSet(int.from_bytes(data[0:1], byteorder="little"))
-        offset = 1
-        source = None
-        target = None
-
-        if len(data) >= offset:
-            source_type = OperandType(int.from_bytes(data[1:2], byteorder="little"))
-            source_address = int.from_bytes(data[2:6], byteorder="little")
-            source = Operand(source_address, source_type)
-            offset += 5
-
-        if len(data) >= offset:
-            target_type = OperandType(int.from_bytes(data[6:7], byteorder="little"))
-            target_address = int.from_bytes(
-                data[offset + 1 : offset + 5], byteorder="little"
-            )
-            target = Operand(target_address, target_type)
-            offset += 5
-
-        parameter = None
-        if len(data) >= offset:
-            parameter_type = OperandType(
-                int.from_bytes(data[offset : offset + 1], byteorder="little")
-            )
-            parameter_value = int.from_bytes(
-                data[offset + 1 : offset + 5], byteorder="little"
-            )
-            parameter = Operand(parameter_value, parameter_type)
-            offset += 5
-
-        return cls(opcode, source, target, parameter)
-
-    def __str__(self):
-        return f"{self.opcode.name}({self.source}, {self.target}, {self.parameter})"
-
-    def __repr__(self):
-        return f"{self.opcode.name}({self.source}, {self.target}, {self.parameter})"
+from asimr.instruction.dispatch import link
+from asimr.fusion import fuse
+from asimr.device import Memory, Register, Stack, Console
+from asimr.decode import Instruction, Operand, INSTRUCTION_SIZE  # 供旧代码从 core 导入
+from asimr.decode import BLOCK, Code, columns, length, memory_range, validate
 
 
 class Core:
     def __init__(
-        self, register: Register, data_mem: Memory, inst_mem: Memory, stack: Stack
+        self,
+        register: Register,
+        data_mem: Memory,
+        inst_mem: Memory,
+        stack: Stack,
+        console: Console = None,
     ):
         self.register = register
         self.memory = data_mem
         self.instruction_memory = inst_mem
         self.stack = stack
+        self.console = console if console is not None else Console()
+        self.code = Code()  # 预解码后的指令，按PC索引
+        self.program = []  # 每条指令选定的处理函数，尚未链接的为 self.stub
+        self.stub = self.lazy
+        self.pairs = set()  # 需要融合为超级指令的操作码对
+        self.snapshot_file = None  # SYSCALL snapshot 写入的文件
+        self.info = None  # 加载的 Program，快照中保存其标签和行号表
+        self.waiting = None  # 阻塞时由 Blocked 给出的就绪检查
+        self.network = None  # 第一次使用网络系统调用时创建
+        self.pending = None  # 正在事件循环上等待的系统调用
+        self.footprint = None  # 指令中内存操作数的地址范围 [low, high)
+        self.exit_code = 0  # HALT 或 exit 系统调用给出的退出码
+        self.feed = None  # 尚未加载的指令块，流式加载时使用
+        self.watchers = []  # 代码改变并重新解码后回调 watcher(address, length)
+        if hasattr(inst_mem, "watchers"):
+            inst_mem.watchers.append(self.reload)
+
+    def load(self, instructions, cols=None, span=None):
+        # 整段写入指令内存，并一次性按列解码整个程序
+        # （cols 为已解码的列，span 为其中内存操作数的范围 [low, high)）
+        # Instruction 和处理函数在第一次执行到所在的块时才创建
+        self.code = Code()
+        self.program = []
+        self.feed = None
+        self.instruction_memory.write_block(0, instructions)
+        self.footprint = None
+        if cols is None:
+            cols = columns(instructions)
+        validate(cols)
+        self.code = Code(cols)
+        self.widen(memory_range(cols) if span is None else span)
+        self.program = [self.stub] * len(self.code)
+        self.changed(0, len(self.code))
+
+    def stream(self, chunks):
+        # 边读取边执行：先加载第一块，执行到尚未加载的部分时再取下一块
+        self.load([])
+        self.feed = iter(chunks)
+        self.pull(0)
+
+    def extend(self, instructions):
+        # 在已加载的程序之后追加一块指令
+        start = len(self.code)
+        self.instruction_memory.write_block(start, instructions)
+        cols = columns(instructions)
+        validate(cols)
+        self.code.append(cols)
+        self.widen(memory_range(cols))
+        self.program += [self.stub] * length(cols)
+        if self.pairs and start:
+            # 上一块的最后一条可能与本块的第一条融合
+            self.program[start - 1] = self.stub
+        self.changed(start, length(cols))
+
+    def pull(self, pc=None):
+        """加载指令块直到 pc 处的指令可用，pc 为 None 时加载全部"""
+        while self.feed is not None and (pc is None or pc >= len(self.code)):
+            chunk = next(self.feed, None)
+            if chunk is None:
+                self.feed = None
+            else:
+                self.extend(chunk)
+
+    def fuse(self, pairs):
+        # 把相邻的高频操作码对替换为超级指令，跳到后一条时仍执行原处理函数
+        # 已链接的处理函数全部作废，重新链接时融合
+        self.pairs = set(pairs)
+        self.program[:] = [self.stub] * len(self.program)
+
+    def track(self, start, end):
+        # 特化的处理函数直接写内存，记录它们可能写到的地址范围
+        self.widen(memory_range(self.code.columns(start, end)))
+
+    def widen(self, span):
+        # 把 [low, high) 并入 footprint
+        if span is None:
+            return
+        low, high = span
+        if self.footprint is not None:
+            low = min(low, self.footprint[0])
+            high = max(high, self.footprint[1])
+        self.footprint = (low, min(high, self.memory.size))
+
+    def relink(self, pc):
+        if self.pairs and pc + 1 < len(self.code):
+            handler = fuse(self, pc)
+            if handler is not None:
+                return handler
+        return link(self, self.code[pc])
+
+    def lazy(self):
+        # 第一次执行到某个块时链接其中的处理函数，再执行当前指令
+        pc = self.register.pc
+        self.link_block(pc)
+        self.program[pc]()
+
+    def link_block(self, pc):
+        program, stub = self.program, self.stub
+        low = pc - pc % BLOCK
+        for i in range(low, min(low + BLOCK, len(program))):
+            if program[i] is stub:
+                program[i] = self.relink(i)
+
+    def handler(self, pc):
+        """pc 处指令的处理函数，尚未链接时先链接所在的块"""
+        if self.program[pc] is self.stub:
+            self.link_block(pc)
+        return self.program[pc]
+
+    def reload(self, address, length):
+        # 指令内存被改写后，重新解码已加载范围内受影响的指令
+        end = min(address + length, len(self.code))
+        for pc in range(address, end):
+            self.code[pc] = self.fetch(pc)
+        self.track(address, end)
+        # 前一条指令可能与被改写的指令融合在一起
+        for pc in range(max(address - 1, 0), end):
+            self.program[pc] = self.relink(pc)
+        if address < end:
+            self.changed(address, end - address)
+
+    def changed(self, address, length):
+        # 在 load、extend 和 reload 更新 code 之后调用，观察者看到的总是新代码
+        for watcher in self.watchers:
+            watcher(address, length)
+
+    def fetch(self, pc):
+        # 超出已加载程序的部分仍从指令内存读取，流式加载时先取下一块
+        if self.feed is not None and pc >= len(self.code):
+            self.pull(pc)
+        return Instruction.unpack(self.instruction_memory.read(pc))
 
     def run_ins(self, ins):
-        ins = Instruction.unpack(ins)
         name = ins.opcode.name
         if hasattr(instruction, name):
             func = getattr(instruction, name)
@@ -133,8 +160,89 @@ class Core:
         else:
             raise CPUError("Unsupported instruction", {"PC[": self.register.pc})
 
-    def run(self):
+    def reset(self):
+        # 原地清空寄存器、数据内存和栈，已链接的处理函数仍然有效
+        register = self.register
+        register._GPR[:] = [0] * len(register._GPR)
+        register.pc = register.sr = register.tc = register.vl = 0
+        # 只清零写入过的内存
+        self.memory.clear_dirty(*(self.footprint or ()))
+        self.stack.sp = 0
+        self.exit_code = 0
+        self.shutdown_network()
+
+    def shutdown(self):
+        # 停机时保证输出缓冲区被写出，并关闭打开的套接字
+        self.console.flush()
+        self.shutdown_network()
+
+    def shutdown_network(self):
+        # 取消事件循环上未完成的系统调用，它不会再写入内存或打开新的套接字
+        if self.pending is not None:
+            self.pending.cancel()
+        self.waiting = self.pending = None
+        if self.network is not None:
+            self.network.shutdown()
+
+    def run(self, quantum=None, loop=None):
+        # 不指定 quantum 时一直运行到停机或阻塞；loop 为替代 Core.loop 的执行循环
+        if quantum is not None:
+            return self.step(quantum)
+        status = Status.HALTED
+        try:
+            (loop or self.loop)()
+        except Halt as e:
+            self.exit_code = e.code
+        except Blocked as e:
+            self.waiting = e.ready
+            status = Status.BLOCKED
+        finally:
+            if status == Status.BLOCKED:
+                self.console.flush()
+            else:
+                self.shutdown()
+        return status
+
+    def step(self, n=1):
+        """最多执行 n 条指令，返回执行后的状态"""
+        program = self.program
+        register = self.register
+        end = register.tc + n
+        self.waiting = None
+        try:
+            while register.tc < end:
+                pc = register.pc
+                if pc >= len(program):
+                    self.run_ins(self.fetch(pc))
+                elif self.pairs and end - register.tc == 1:
+                    # 只剩一条的配额时不执行超级指令，以免超出配额
+                    link(self, self.code[pc])()
+                else:
+                    program[pc]()
+                register.tc += 1
+                register.pc += 1
+        except Halt as e:
+            self.exit_code = e.code
+            self.shutdown()
+            return Status.HALTED
+        except Blocked as e:
+            self.waiting = e.ready
+            return Status.BLOCKED
+        return Status.READY
+
+    def loop(self):
+        program = self.program
+        register = self.register
         while True:
-            self.run_ins(self.instruction_memory.read(self.register.pc))
-            self.register.tc += 1
-            self.register.pc += 1
+            try:
+                while True:
+                    program[register.pc]()
+                    register.tc += 1
+                    register.pc += 1
+            except IndexError:
+                if register.pc < len(program):
+                    raise
+            # 超出已加载程序的部分逐条解码执行
+            self.run_ins(self.fetch(register.pc))
+            register.tc += 1
+            register.pc += 1
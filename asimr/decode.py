@@ -0,0 +1,300 @@
+import bisect
+import struct
+from collections import namedtuple
+from asimr.constant import InstructionSet, OperandType
+
+try:
+    import numpy
+except ImportError:  # 没有 NumPy 时用 struct 逐条解码
+    numpy = None
+
+INSTRUCTION_SIZE = 16  # 每条指令编码后的字节数
+NO_OPERAND = 0xFF  # 表示操作数不存在的类型字节
+LAYOUT = struct.Struct("<BBIBIBI")
+
+
+class Operand:
+    __slots__ = ("value", "type")
+
+    def __init__(self, n, type):
+        if not isinstance(type, OperandType):
+            raise ValueError("type must is OperandType")
+        self.value = n
+        self.type = type
+
+    def __str__(self):
+        return f"Operand({self.value}, {self.type.name})"
+
+    def __repr__(self):
+        return self.__str__()
+
+
+class Instruction:
+    __slots__ = ("opcode", "source", "target", "parameter")
+
+    def __init__(
+        self, opcode: InstructionSet, source=None, target=None, parameter=None
+    ):
+        self.opcode = opcode
+        self.source = source
+        self.target = target
+        self.parameter = parameter
+
+    def pack(self, to_int=False):
+        # 定长编码：操作码 + 3 个 (类型 1 字节, 值 4 字节)，缺少的操作数类型为 NO_OPERAND
+        fields = [self.opcode.value]
+        for operand in (self.source, self.target, self.parameter):
+            if operand is None:
+                fields += (NO_OPERAND, 0)
+            else:
+                fields += (operand.type.value, operand.value)
+        data = LAYOUT.pack(*fields)
+
+        if to_int:
+            return int.from_bytes(data, byteorder="little")
+        else:
+            return data
+
+    @classmethod
+    def unpack(cls, data, from_int=False):
+        if from_int:
+            data = data.to_bytes(INSTRUCTION_SIZE, byteorder="little")
+
+        if type(data) == int:
+            return cls(InstructionSet.HALT)
+
+        if len(data) >= INSTRUCTION_SIZE:
+            fields = LAYOUT.unpack_from(data)
+            operands = [
+                None if t == NO_OPERAND else Operand(v, OperandType(t))
+                for t, v in zip(fields[1::2], fields[2::2])
+            ]
+            return cls(InstructionSet(fields[0]), *operands)
+
+        # 旧的变长编码（1、6 或 11 字节），按长度判断有哪些操作数
+        operands = []
+        for offset in range(1, len(data) - 4, 5):
+            operand_type = OperandType(data[offset])
+            value = int.from_bytes(data[offset + 1 : offset + 5], byteorder="little")
+            operands.append(Operand(value, operand_type))
+        return cls(InstructionSet(data[0]), *operands)
+
+    def __str__(self):
+        return f"{self.opcode.name}({self.source}, {self.target}, {self.parameter})"
+
+    def __repr__(self):
+        return f"{self.opcode.name}({self.source}, {self.target}, {self.parameter})"
+
+
+# 与 Instruction.pack 的定长编码一致：操作码 + 3 个 (类型, 值)
+if numpy is not None:
+    OPERAND = numpy.dtype([("type", "u1"), ("value", "<u4")])
+    DTYPE = numpy.dtype([("opcode", "u1"), ("operands", OPERAND, (3,))])
+    assert DTYPE.itemsize == INSTRUCTION_SIZE
+
+# opcode 为 (n,)，type 和 value 为 (n, 3)，依次为 source、target、parameter
+Columns = namedtuple("Columns", ["opcode", "type", "value"])
+
+MASK = 0xFFFFFFFF
+
+
+def to_buffer(instructions):
+    """把指令序列拼成一整块定长编码的字节"""
+    buffer = getattr(instructions, "buffer", None)
+    if buffer is not None:  # acb.InstructionTable，直接使用映射的指令表
+        return buffer
+    try:
+        data = b"".join(instructions)
+    except TypeError:  # 含有表示空指令的 0（指令内存中未写入的位置）
+        data = None
+    if data is None or len(data) != len(instructions) * INSTRUCTION_SIZE:
+        # 含有旧的变长编码或空指令，逐条转为定长编码
+        data = b"".join(
+            (
+                inst
+                if isinstance(inst, bytes) and len(inst) == INSTRUCTION_SIZE
+                else Instruction.unpack(inst).pack()
+            )
+            for inst in instructions
+        )
+    return data
+
+
+def columns(instructions) -> Columns:
+    """一次解码整个程序，返回按列存放的操作码、操作数类型和操作数值"""
+    data = to_buffer(instructions)
+    if numpy is not None:
+        table = numpy.frombuffer(data, dtype=DTYPE)
+        operands = table["operands"]
+        return Columns(table["opcode"], operands["type"], operands["value"])
+    rows = list(struct.iter_unpack(LAYOUT.format, data))
+    return Columns(
+        [row[0] for row in rows],
+        [row[1::2] for row in rows],
+        [row[2::2] for row in rows],
+    )
+
+
+def tolist(column):
+    return column.tolist() if hasattr(column, "tolist") else column
+
+
+def build(cols: Columns):
+    """由列创建 Instruction 对象，相同的操作数共享同一个 Operand"""
+    if numpy is not None and isinstance(cols.type, numpy.ndarray):
+        # 类型和值合成一个键，操作数去重后每种只创建一次
+        keys = (cols.type.astype("u8") << 32) | cols.value
+        unique = numpy.unique(keys).tolist()
+        keys = keys.tolist()
+    else:
+        keys = [
+            [(t << 32) | v for t, v in zip(types, values)]
+            for types, values in zip(cols.type, cols.value)
+        ]
+        unique = {k for row in keys for k in row}
+    operands = {
+        k: None if k >> 32 == NO_OPERAND else Operand(k & MASK, OperandType(k >> 32))
+        for k in unique
+    }
+    opcodes = {op: InstructionSet(op) for op in set(tolist(cols.opcode))}
+    return [
+        Instruction(opcodes[op], operands[a], operands[b], operands[c])
+        for op, (a, b, c) in zip(tolist(cols.opcode), keys)
+    ]
+
+
+def decode(instructions):
+    return build(columns(instructions))
+
+
+def memory_range(cols: Columns):
+    """内存操作数的地址范围 [low, high)，没有内存操作数时返回 None"""
+    memory = OperandType.Memory.value
+    if numpy is not None and isinstance(cols.type, numpy.ndarray):
+        addresses = cols.value[cols.type == memory]
+        if not addresses.size:
+            return None
+        return int(addresses.min()), int(addresses.max()) + 1
+    addresses = [
+        v
+        for types, values in zip(cols.type, cols.value)
+        for t, v in zip(types, values)
+        if t == memory
+    ]
+    if not addresses:
+        return None
+    return min(addresses), max(addresses) + 1
+
+
+def lookup(values):
+    """字节值 -> 是否属于 values 的查找表，用数组索引代替逐个比较"""
+    table = numpy.zeros(256, dtype=bool)
+    table[list(values)] = True
+    return table
+
+
+def validate(cols: Columns):
+    """检查整个程序的操作码和操作数类型，无效时抛出 ValueError"""
+    opcodes = {op.value for op in InstructionSet}
+    types = {t.value for t in OperandType} | {NO_OPERAND}
+    if numpy is not None and isinstance(cols.type, numpy.ndarray):
+        valid_opcode, valid_type = lookup(opcodes), lookup(types)
+        if valid_opcode[cols.opcode].all() and valid_type[cols.type].all():
+            return
+        good = valid_opcode[cols.opcode] & valid_type[cols.type].all(axis=1)
+        pc = int(numpy.flatnonzero(~good)[0])
+    else:
+        pc = next(
+            (
+                pc
+                for pc, (op, row) in enumerate(zip(cols.opcode, cols.type))
+                if op not in opcodes or not types.issuperset(row)
+            ),
+            None,
+        )
+    if pc is not None:
+        raise ValueError(f"Invalid instruction at {pc}")
+
+
+def length(cols: Columns):
+    return len(cols.opcode)
+
+
+def select(cols: Columns, start, end):
+    return Columns(*(column[start:end] for column in cols))
+
+
+def concat(parts):
+    """把若干段列首尾相接"""
+    if len(parts) == 1:
+        return parts[0]
+    if numpy is not None and isinstance(parts[0].type, numpy.ndarray):
+        return Columns(*(numpy.concatenate(column) for column in zip(*parts)))
+    return Columns(*([x for column in group for x in column] for group in zip(*parts)))
+
+
+BLOCK = 256  # Code 每次创建的 Instruction 数
+
+
+class Code:
+    """按 PC 索引的已解码指令
+
+    加载时只保存整块解码出的列，Instruction 在第一次访问时按块创建；
+    分析整个程序（如 JIT 划分基本块）时直接使用 columns。
+    """
+
+    def __init__(self, cols: Columns = None):
+        self.chunks = []  # [(起始 pc, 列)]，extend 追加的每块各占一项
+        self.starts = []  # 各块的起始 pc，用于二分查找
+        self.items = []  # 已创建的 Instruction，尚未创建的为 None
+        self.patched = set()  # 被改写过、与列不再一致的 pc
+        if cols is not None:
+            self.append(cols)
+
+    def append(self, cols: Columns):
+        self.starts.append(len(self.items))
+        self.chunks.append((len(self.items), cols))
+        self.items += [None] * length(cols)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __getitem__(self, pc):
+        ins = self.items[pc]
+        if ins is None:
+            self.fill(pc % len(self.items))
+            ins = self.items[pc]
+        return ins
+
+    def __setitem__(self, pc, ins):
+        self.items[pc] = ins
+        self.patched.add(pc)
+
+    def __iter__(self):
+        for pc in range(len(self.items)):
+            yield self[pc]
+
+    def chunk(self, pc):
+        return self.chunks[bisect.bisect_right(self.starts, pc) - 1]
+
+    def fill(self, pc):
+        # 创建 pc 所在块的全部 Instruction，已改写的保持不变
+        start, cols = self.chunk(pc)
+        low = start + (pc - start) // BLOCK * BLOCK
+        high = min(low + BLOCK, start + length(cols))
+        items = self.items
+        for i, ins in enumerate(build(select(cols, low - start, high - start)), low):
+            if items[i] is None:
+                items[i] = ins
+
+    def columns(self, start=0, end=None) -> Columns:
+        """[start, end) 范围内指令的列"""
+        end = len(self.items) if end is None else min(end, len(self.items))
+        if any(start <= pc < end for pc in self.patched):
+            return columns([self[pc].pack() for pc in range(start, end)])
+        parts = []
+        for offset, cols in self.chunks:
+            low, high = max(start, offset), min(end, offset + length(cols))
+            if low < high:
+                parts.append(select(cols, low - offset, high - offset))
+        return concat(parts) if parts else columns([])
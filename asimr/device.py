@@ -1,4 +1,5 @@
-import queue
+import sys
+from array import array
 from asimr.constant import MemoryError, ASIMError
 
 
@@ -7,6 +8,7 @@ class Register:
         self.pc = 0  # 程序计数器
         self.sr = 0  # 状态寄存器
         self.tc = 0  # 频率计数器
+        self.vl = 0  # 向量长度寄存器
         self._struct = struct
         self._GPR = [0] * n_GPR  # 通用寄存器
 
@@ -28,17 +30,52 @@ class Register:
         # 打印通用寄存器
         gpr_str = "\n".join(f"r{n}: {val:08X}" for n, val in enumerate(self._GPR))
         # 打印其他寄存器状态
-        status_str = f"pc: {self.pc:08X}\nsr: {self.sr:08X}\ntc: {self.tc}"
+        status_str = (
+            f"pc: {self.pc:08X}\nsr: {self.sr:08X}\ntc: {self.tc}\nvl: {self.vl}"
+        )
         return (
             f"General Purpose Registers:\n{gpr_str}\n\nSpecial Registers:\n{status_str}"
         )
 
 
+# 按字宽选择 array 的类型码
+TYPECODES = {array(tc).itemsize: tc for tc in "QLIHB"}
+
+
 class Memory:
-    def __init__(self, size, strict=False):
+    def __init__(self, size, strict=False, width=1):
         self.size = size
-        self.data = [0] * size
         self.strict = strict
+        self.width = width
+        if strict:
+            # 严格模式下使用定长的类型化存储，写入时按字宽截断
+            self.mask = (1 << (8 * width)) - 1
+            if width == 1:
+                self.data = bytearray(size)
+            else:
+                self.data = array(TYPECODES[width], [0]) * size
+        else:
+            self.mask = -1
+            self.data = [0] * size
+        self.dirty = None  # 通过本类方法写入过的范围 [low, high)，None 表示全为零
+
+    @classmethod
+    def from_buffer(cls, data, width=1):
+        # 使用已有的缓冲区（如 mmap）作为严格模式的存储
+        memory = cls.__new__(cls)
+        memory.size = len(data)
+        memory.strict = True
+        memory.width = width
+        memory.mask = (1 << (8 * width)) - 1
+        memory.data = data
+        memory.dirty = [0, memory.size]  # 已有内容未知
+        return memory
+
+    def check(self, address, length=1):
+        if not (0 <= address and address + length <= self.size and length >= 0):
+            raise MemoryError(
+                f"Nonexistent memory address: {address}", {"Length": length}
+            )
 
     def read(self, address):
         if 0 <= address < self.size:
@@ -46,31 +83,214 @@ class Memory:
         else:
             raise MemoryError(f"Nonexistent memory address: {address}")
 
+    def touch(self, address, length):
+        # 扩大脏范围；特化的处理函数直接写 data，其地址由 Core 在加载时统计
+        dirty = self.dirty
+        if dirty is None:
+            self.dirty = [address, address + length]
+        else:
+            if address < dirty[0]:
+                dirty[0] = address
+            if address + length > dirty[1]:
+                dirty[1] = address + length
+
     def write(self, address, data):
         if 0 <= address < self.size:
             if self.strict:
-                data = data & 0xFF
+                data = data & self.mask
             self.data[address] = data
+            self.touch(address, 1)
         else:
             raise MemoryError(f"Nonexistent memory address: {address}")
 
+    def read_block(self, address, length):
+        # 整段只做一次边界检查
+        self.check(address, length)
+        return self.data[address : address + length]
+
+    def write_block(self, address, data):
+        self.check(address, len(data))
+        if self.strict and not (
+            self.width == 1 and isinstance(data, (bytes, bytearray))
+        ):
+            data = [d & self.mask for d in data]
+            if self.width == 1:
+                data = bytes(data)
+            else:
+                data = array(TYPECODES[self.width], data)
+        self.data[address : address + len(data)] = data
+        self.touch(address, len(data))
+
+    def move(self, source, target, length):
+        # 先取出源数据的副本，源和目标重叠时结果与 memmove 相同
+        self.check(source, length)
+        self.check(target, length)
+        block = self.data[source : source + length]
+        if isinstance(block, memoryview):
+            block = array(block.format, block.tobytes())
+        self.data[target : target + length] = block
+        self.touch(target, length)
+
+    def fill(self, address, value, length):
+        self.check(address, length)
+        if not self.strict:
+            block = [value] * length
+        elif self.width == 1:
+            block = bytes([value & self.mask]) * length
+        else:
+            block = array(TYPECODES[self.width], [value & self.mask]) * length
+        self.data[address : address + length] = block
+        self.touch(address, length)
+
+    def compare(self, a, b, length):
+        # 与 memcmp 相同，返回 -1、0 或 1
+        x = self.read_block(a, length)
+        y = self.read_block(b, length)
+        if isinstance(x, memoryview):
+            x, y = x.tolist(), y.tolist()
+        return (x > y) - (x < y)
+
+    def clear(self, address=0, length=None):
+        # 原地清零，保持存储对象不变
+        if length is None:
+            length = self.size - address
+        self.check(address, length)
+        if not self.strict:
+            zeros = [0] * length
+        elif self.width == 1:
+            zeros = bytes(length)
+        else:
+            zeros = array(TYPECODES[self.width], [0]) * length
+        self.data[address : address + length] = zeros
+        if address == 0 and length == self.size:
+            self.dirty = None
+
+    def clear_dirty(self, low=None, high=None):
+        """只清零写入过的范围，[low, high) 为调用者额外知道的写入范围"""
+        dirty = self.dirty
+        if low is not None and high > low:
+            if dirty is None:
+                dirty = [low, high]
+            else:
+                dirty = [min(dirty[0], low), max(dirty[1], high)]
+        if dirty is not None:
+            self.clear(dirty[0], dirty[1] - dirty[0])
+        self.dirty = None
+
     def __str__(self):
         # 每16个字节为一块
         memory_str = "\n" + " ".join(f"{byte}" for byte in self.data) + "\n"
         return memory_str
 
 
+class InstructionMemory(Memory):
+    # 按已加载程序的大小分配，只有写入超出已有部分时才增长（上限为 size）
+    # 整段载入的只读指令表（如映射的 .acb）直接作为存储，第一次改写时才复制为列表
+    def __init__(self, size):
+        self.size = size
+        self.strict = False
+        self.width = 1
+        self.mask = -1
+        self.data = []
+        self.dirty = None
+        self.watchers = []  # 写入后回调 watcher(address, length)
+
+    def notify(self, address, length):
+        for watcher in self.watchers:
+            watcher(address, length)
+
+    def own(self):
+        if not isinstance(self.data, list):
+            self.data = list(self.data)
+
+    def grow(self, end):
+        self.own()
+        if end > len(self.data):
+            self.data.extend([0] * (end - len(self.data)))
+
+    def read(self, address):
+        if 0 <= address < len(self.data):
+            return self.data[address]
+        elif 0 <= address < self.size:
+            return 0  # 未写入的部分视为空指令
+        else:
+            raise MemoryError(f"Nonexistent memory address: {address}")
+
+    def write(self, address, data):
+        if 0 <= address < len(self.data):
+            self.own()
+            self.data[address] = data
+        elif 0 <= address < self.size:
+            self.grow(address)
+            self.data.append(data)
+        else:
+            raise MemoryError(f"Nonexistent memory address: {address}")
+        self.notify(address, 1)
+
+    def read_block(self, address, length):
+        self.check(address, length)
+        block = self.data[address : address + length]
+        return block + [0] * (length - len(block))
+
+    def write_block(self, address, data):
+        self.check(address, len(data))
+        if address == 0 and len(data) >= len(self.data) and not isinstance(data, list):
+            self.data = data  # 不逐条复制
+        else:
+            self.grow(address)
+            self.data[address : address + len(data)] = data
+        self.notify(address, len(data))
+
+
 class Stack:
     def __init__(self, size=64):
-        self.data = queue.LifoQueue(size)
+        self.size = size  # 小于等于 0 时不限制深度，与原来的 LifoQueue 相同
+        self.data = [0] * max(size, 0)  # 预先分配的栈空间，不限制深度时按需增长
+        self.sp = 0  # 栈指针，指向下一个空位
 
     def push(self, data: int):
-        if self.data.full():
+        sp = self.sp
+        if sp < len(self.data):
+            self.data[sp] = data
+        elif self.size > 0:
             raise ASIMError("Stack overflow")
-        self.data.put(data)
+        else:
+            self.data.append(data)
+        self.sp = sp + 1
 
     def pop(self):
-        if self.data.empty():
+        sp = self.sp
+        if sp == 0:
             return 0
 
-        return self.data.get()
+        sp -= 1
+        self.sp = sp
+        return self.data[sp]
+
+
+class Console:
+    def __init__(self, buffer_size=8192, stream=None):
+        self.buffer_size = buffer_size  # 为 0 时不缓冲
+        self.stream = stream  # 为 None 时写入当前的 sys.stdout
+        self.buffer = []
+        self.length = 0
+
+    def write(self, text: str):
+        if self.buffer_size <= 0:
+            stream = self.stream or sys.stdout
+            stream.write(text)
+            stream.flush()
+            return
+
+        self.buffer.append(text)
+        self.length += len(text)
+        if self.length >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        stream = self.stream or sys.stdout
+        if self.buffer:
+            stream.write("".join(self.buffer))
+            self.buffer.clear()
+            self.length = 0
+        stream.flush()
@@ -0,0 +1,143 @@
+import json
+from collections import Counter
+from asimr.constant import InstructionSet, Blocked
+from asimr.instruction.dispatch import (
+    ENV,
+    SCOPE,
+    TEMPLATES,
+    environment,
+    statement,
+    operand_kind,
+)
+
+# 会改变 pc 的指令不能作为超级指令的前半部分
+CONTROL = {
+    InstructionSet.JMP,
+    InstructionSet.JNZ,
+    InstructionSet.JZ,
+    InstructionSet.JE,
+    InstructionSet.JNE,
+    InstructionSet.JG,
+    InstructionSet.JGE,
+    InstructionSet.JB,
+    InstructionSet.JBE,
+    InstructionSet.CALL,
+    InstructionSet.RET,
+    InstructionSet.HALT,
+}
+
+FUSED = {}  # (操作码, 操作码, 操作数组合) -> 特化工厂
+
+
+class PairProfile:
+    """统计相邻执行的操作码对，用于挑选超级指令"""
+
+    def __init__(self):
+        self.counts = Counter()
+        self.last = None  # 阻塞时上一条已执行指令的 pc，恢复后接着统计
+
+    def run(self, cpu):
+        return cpu.run(loop=lambda: self.loop(cpu))
+
+    def loop(self, cpu):
+        counts = self.counts
+        code = cpu.code
+        program = cpu.program
+        register = cpu.register
+        last, self.last = self.last, None
+        while True:
+            pc = register.pc
+            done = True
+            try:
+                if pc < len(program):
+                    program[pc]()
+                else:
+                    cpu.run_ins(cpu.fetch(pc))
+            except Blocked:
+                done = False  # 恢复后会重新执行这条指令，到那时再计数
+                self.last = last
+                raise
+            finally:
+                # 指令执行完才计数，HALT 等以异常结束的指令也算在内
+                if done and last == pc - 1:
+                    counts[(code[last].opcode.name, code[pc].opcode.name)] += 1
+            last = pc
+            register.tc += 1
+            register.pc += 1
+
+    def save(self, file):
+        pairs = [[a, b, n] for (a, b), n in self.counts.most_common()]
+        with open(file, "w") as f:
+            json.dump({"pairs": pairs}, f, indent=2)
+
+
+def load_pairs(file):
+    with open(file) as f:
+        data = json.load(f)
+    return Counter({(a, b): n for a, b, n in data.get("pairs", [])})
+
+
+def select(counts, limit=8, min_share=0.01):
+    """按出现频率挑选要融合的操作码对"""
+    total = sum(counts.values())
+    pairs = set()
+    for (a, b), n in counts.most_common():
+        if len(pairs) >= limit or n < total * min_share:
+            break
+        if a not in InstructionSet.__members__ or b not in InstructionSet.__members__:
+            continue
+        first, second = InstructionSet[a], InstructionSet[b]
+        if first in CONTROL or first not in TEMPLATES or second not in TEMPLATES:
+            continue
+        pairs.add((first, second))
+    return pairs
+
+
+def factory(first, second, kinds):
+    key = (first, second, kinds)
+    if key not in FUSED:
+        a = statement(first, kinds[:3], ("s1", "t1", "p1"))
+        b = statement(second, kinds[3:], ("s2", "t2", "p2"))
+        if a is None or b is None:
+            FUSED[key] = None
+        else:
+            # 第二条执行时 pc 指向它自己，跳转时会被覆盖
+            code = (
+                f"def factory({ENV}, s1, t1, p1, s2, t2, p2, pc):\n"
+                "  def handler():\n"
+                f"    {a}\n"
+                "    reg.tc += 1\n"
+                "    reg.pc = pc\n"
+                f"    {b}\n"
+                "  return handler\n"
+            )
+            scope = dict(SCOPE)
+            name = f"<asim {first.name}+{second.name} {kinds}>"
+            exec(compile(code, name, "exec"), scope)
+            FUSED[key] = scope["factory"]
+    return FUSED[key]
+
+
+def fuse(cpu, pc):
+    """把 pc 与 pc + 1 两条指令融合为一个处理函数，无法融合时返回 None"""
+    first, second = cpu.code[pc], cpu.code[pc + 1]
+    if (first.opcode, second.opcode) not in cpu.pairs:
+        return None
+    operands = (
+        first.source,
+        first.target,
+        first.parameter,
+        second.source,
+        second.target,
+        second.parameter,
+    )
+    kinds = "".join(operand_kind(cpu, o) for o in operands)
+    make = factory(first.opcode, second.opcode, kinds)
+    if make is None:
+        return None
+
+    return make(
+        *environment(cpu),
+        *(o.value if o is not None else None for o in operands),
+        pc + 1,
+    )
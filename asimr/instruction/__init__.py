@@ -1 +1,4 @@
 from .instruction import *
+from .syscall import *
+from .vector import *
+from .block import *
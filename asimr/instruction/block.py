@@ -0,0 +1,21 @@
+from .utils import get_value, get_address
+
+__all__ = ["MEMCPY", "MEMSET", "MEMCMP"]
+
+
+def MEMCPY(cpu, ins):
+    source = get_address(cpu, ins.source)
+    target = get_address(cpu, ins.target)
+    cpu.memory.move(source, target, get_value(cpu, ins.parameter))
+
+
+def MEMSET(cpu, ins):
+    value = get_value(cpu, ins.source)
+    target = get_address(cpu, ins.target)
+    cpu.memory.fill(target, value, get_value(cpu, ins.parameter))
+
+
+def MEMCMP(cpu, ins):
+    a = get_address(cpu, ins.source)
+    b = get_address(cpu, ins.target)
+    cpu.register.sr = cpu.memory.compare(a, b, get_value(cpu, ins.parameter))
@@ -0,0 +1,173 @@
+from asimr.constant import InstructionSet, OperandType, CPUError, Halt
+import asimr.instruction as instruction
+
+# 操作数种类：n 立即数，r 寄存器，m 内存，x 无法特化（交给通用处理函数）
+_READ = {"n": "{}", "r": "gpr[{}]", "m": "mem[{}]"}
+_WRITE = {"r": "gpr[{}] = ({}) & rmask", "m": "mem[{}] = ({}) & mmask"}
+
+# 指令模板：{s} {t} {p} 为操作数的读取表达式，{S} {T} {P} 为写入语句，
+# {tv} 为 target 操作数的原始值
+TEMPLATES = {
+    InstructionSet.NOP: "pass",
+    InstructionSet.HALT: "raise Halt()",
+    InstructionSet.PNC: "console.write(str({s}))",
+    InstructionSet.PAC: "console.write(chr({s}))",
+    InstructionSet.MOV: "{T}",
+    InstructionSet.ADD: "{P}",
+    InstructionSet.SUB: "{P}",
+    InstructionSet.MUL: "{P}",
+    InstructionSet.MOD: "{P}",
+    InstructionSet.AND: "{P}",
+    InstructionSet.OR: "{P}",
+    InstructionSet.XOR: "{P}",
+    InstructionSet.SHL: "{P}",
+    InstructionSet.SHR: "{P}",
+    InstructionSet.NOT: "{T}",
+    InstructionSet.PUSH: "stack.push({s})",
+    InstructionSet.POP: "{S}",
+    InstructionSet.JMP: "reg.pc = {s}",
+    InstructionSet.JNZ: "if {s} != 0: reg.pc = {tv}",
+    InstructionSet.JZ: "if {s} == 0: reg.pc = {tv}",
+    InstructionSet.JE: "if {s} == {t}: reg.pc = {p}",
+    InstructionSet.JNE: "if {s} != {t}: reg.pc = {p}",
+    InstructionSet.JG: "if {s} > {t}: reg.pc = {p}",
+    InstructionSet.JGE: "if {s} >= {t}: reg.pc = {p}",
+    InstructionSet.JB: "if {s} < {t}: reg.pc = {p}",
+    InstructionSet.JBE: "if {s} <= {t}: reg.pc = {p}",
+    InstructionSet.MPC: "{S}",
+    InstructionSet.MSR: "{S}",
+    InstructionSet.MTC: "{S}",
+    InstructionSet.CALL: "stack.push(reg.pc); reg.pc = {s}",
+    InstructionSet.RET: "reg.pc = stack.pop()",
+}
+
+# 写入目标的值，S/T/P 分别表示写入 source/target/parameter
+VALUES = {
+    InstructionSet.MOV: "{s}",
+    InstructionSet.ADD: "{t} + {s}",
+    InstructionSet.SUB: "{t} - {s}",
+    InstructionSet.MUL: "{t} * {s}",
+    InstructionSet.MOD: "{t} % {s}",
+    InstructionSet.AND: "{t} & {s}",
+    InstructionSet.OR: "{t} | {s}",
+    InstructionSet.XOR: "{t} ^ {s}",
+    InstructionSet.SHL: "{t} << {s}",
+    InstructionSet.SHR: "{t} >> {s}",
+    InstructionSet.NOT: "~{s}",
+    InstructionSet.POP: "stack.pop()",
+    InstructionSet.MPC: "reg.pc",
+    InstructionSet.MSR: "reg.sr",
+    InstructionSet.MTC: "reg.tc",
+}
+
+# 生成的工厂函数共用的参数，由 environment() 按同样的顺序提供
+ENV = "reg, gpr, mem, stack, console, rmask, mmask"
+SCOPE = {"Halt": Halt}
+
+# 按操作码整数值索引的分派表，每一项缓存该指令各操作数组合的特化工厂
+DISPATCH = [None] * len(InstructionSet)
+for _op in InstructionSet:
+    if _op in TEMPLATES:
+        DISPATCH[_op.value] = {}
+
+
+def operand_kind(cpu, operand):
+    if operand is None:
+        return "x"
+    if operand.type == OperandType.Number:
+        return "n"
+    if operand.type == OperandType.Register:
+        return "r" if 0 <= operand.value < len(cpu.register._GPR) else "x"
+    if operand.type == OperandType.Memory:
+        return "m" if 0 <= operand.value < cpu.memory.size else "x"
+    return "x"
+
+
+def statement(opcode, kinds, names=("s", "t", "p")):
+    """生成一条指令的语句，names 为各操作数的值（变量名或字面量）"""
+    reads = {
+        n: _READ[k].format(v) for n, k, v in zip("stp", kinds, names) if k in _READ
+    }
+    body = TEMPLATES[opcode]
+    try:
+        if opcode in VALUES:
+            value = VALUES[opcode].format(**reads)
+            for n, k, v in zip("STP", kinds, names):
+                key = "{" + n + "}"
+                if key in body:
+                    if k not in _WRITE:
+                        return None  # 无法写入的目标，交给通用处理函数
+                    body = body.replace(key, _WRITE[k].format(v, value))
+        return body.format(tv=names[1], **reads)
+    except KeyError:
+        return None  # 用到了无法特化的操作数
+
+
+def source(opcode, kinds):
+    """生成某个操作码在给定操作数组合下的处理函数源码"""
+    body = statement(opcode, kinds)
+    if body is None:
+        return None
+    return (
+        f"def factory({ENV}, s, t, p):\n"
+        "  def handler():\n"
+        f"    {body}\n"
+        "  return handler\n"
+    )
+
+
+def variant(opcode, kinds):
+    """取出（必要时编译）某个操作数组合的特化工厂"""
+    variants = DISPATCH[opcode.value]
+    if kinds not in variants:
+        code = source(opcode, kinds)
+        if code is None:
+            variants[kinds] = None
+        else:
+            scope = dict(SCOPE)
+            exec(compile(code, f"<asim {opcode.name} {kinds}>", "exec"), scope)
+            variants[kinds] = scope["factory"]
+    return variants[kinds]
+
+
+def generic(cpu, ins):
+    """未特化的指令，沿用 instruction 模块中的处理函数"""
+    name = ins.opcode.name
+    if hasattr(instruction, name):
+        func = getattr(instruction, name)
+        return lambda: func(cpu, ins)
+
+    def unsupported():
+        raise CPUError("Unsupported instruction", {"PC": cpu.register.pc})
+
+    return unsupported
+
+
+def environment(cpu):
+    register = cpu.register
+    return (
+        register,
+        register._GPR,
+        cpu.memory.data,
+        cpu.stack,
+        cpu.console,
+        0xFF if register._struct else -1,
+        cpu.memory.mask,
+    )
+
+
+def link(cpu, ins):
+    """在加载时为一条已解码的指令选出处理函数"""
+    if DISPATCH[ins.opcode.value] is None:
+        return generic(cpu, ins)
+
+    operands = (ins.source, ins.target, ins.parameter)
+    kinds = "".join(operand_kind(cpu, o) for o in operands)
+    factory = variant(ins.opcode, kinds)
+    if factory is None:
+        return generic(cpu, ins)
+
+    return factory(
+        *environment(cpu),
+        *(o.value if o is not None else None for o in operands),
+    )
@@ -1,21 +1,20 @@
-from asimr.constant import InstructionSet, OperandType, error
-import sys
+from asimr.constant import InstructionSet, OperandType, Halt, error
 from .utils import get_value, write_value
 
 
 def HALT(cpu, ins):
-    sys.exit()
+    raise Halt()
 
 
 def PNC(cpu, ins):
 
     data = get_value(cpu, ins.source)
-    sys.stdout.write(str(data))
+    cpu.console.write(str(data))
 
 
 def PAC(cpu, ins):
     char = get_value(cpu, ins.source)
-    sys.stdout.write(chr(char) if isinstance(char, int) else char)
+    cpu.console.write(chr(char) if isinstance(char, int) else char)
 
 
 def MOV(cpu, ins):
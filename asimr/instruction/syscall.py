@@ -1,2 +1,39 @@
+from asimr.constant import SyscallTable, Halt
+from .utils import get_value, get_address
+
+NETWORK = {
+    SyscallTable.socket.value,
+    SyscallTable.accept.value,
+    SyscallTable.listen.value,
+    SyscallTable.bind.value,
+    SyscallTable.connect.value,
+    SyscallTable.send.value,
+    SyscallTable.close.value,
+    SyscallTable.recv.value,
+}
+
+
 def SYSCALL(cpu, ins):
-    pass
+    number = get_value(cpu, ins.source)
+    target = ins.target
+    if number == SyscallTable.exit.value:
+        # 第二个操作数为退出码，省略时为 0
+        raise Halt(get_value(cpu, target) if target is not None else 0)
+    elif number == SyscallTable.flush.value:
+        cpu.console.flush()
+    elif number == SyscallTable.snapshot.value:
+        if cpu.snapshot_file is not None:
+            from asimr.snapshot import dump
+
+            # 恢复后从下一条指令继续执行
+            register = cpu.register
+            pc, tc = register.pc + 1, register.tc + 1
+            dump(cpu, cpu.snapshot_file, cpu.info, pc=pc, tc=tc)
+    elif number in NETWORK:
+        # 第二个操作数为参数块地址（省略时为 0），结果写入状态寄存器
+        if cpu.network is None:
+            from asimr.network import Network
+
+            cpu.network = Network()
+        params = get_address(cpu, target) if target is not None else 0
+        cpu.network.call(cpu, number, params)
@@ -15,3 +15,10 @@ def write_value(cpu, operand_type, address, data):
         return cpu.register.set(address, data)
     elif operand_type == OperandType.Memory:
         return cpu.memory.write(address, data)
+
+
+def get_address(cpu, operand):
+    # 内存操作数取其地址，寄存器和立即数取其值
+    if operand.type == OperandType.Memory:
+        return operand.value
+    return get_value(cpu, operand)
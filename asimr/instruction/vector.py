@@ -0,0 +1,99 @@
+import operator
+from .utils import get_value, get_address, write_value
+
+__all__ = [
+    "VLEN",
+    "VADD",
+    "VSUB",
+    "VMUL",
+    "VAND",
+    "VXOR",
+    "VSUM",
+    "VMIN",
+    "VMAX",
+    "VCMP",
+]
+
+try:
+    import numpy
+except ImportError:  # 没有 NumPy 时逐个元素计算
+    numpy = None
+
+# 元素运算：结果 = target 区域 op source 区域，与标量指令一致
+ELEMENTWISE = {
+    "VADD": (operator.add, "add"),
+    "VSUB": (operator.sub, "subtract"),
+    "VMUL": (operator.mul, "multiply"),
+    "VAND": (operator.and_, "bitwise_and"),
+    "VXOR": (operator.xor, "bitwise_xor"),
+}
+
+REDUCTIONS = {"VSUM": (sum, "sum"), "VMIN": (min, "min"), "VMAX": (max, "max")}
+
+
+def view(memory):
+    """返回数据内存的 NumPy 视图，无法建立视图时返回 None"""
+    if numpy is None or not memory.strict:
+        return None
+    return numpy.frombuffer(memory.data, dtype=f"u{memory.width}")
+
+
+def VLEN(cpu, ins):
+    cpu.register.vl = get_value(cpu, ins.source)
+
+
+def elementwise(cpu, ins):
+    func, ufunc = ELEMENTWISE[ins.opcode.name]
+    memory = cpu.memory
+    n = cpu.register.vl
+    a, b, c = (get_address(cpu, o) for o in (ins.source, ins.target, ins.parameter))
+    for base in (a, b, c):
+        memory.check(base, n)
+
+    mem = view(memory)
+    if mem is not None:
+        # 无符号整数运算自动按字宽回绕，与 strict 内存的截断一致
+        getattr(numpy, ufunc)(mem[b : b + n], mem[a : a + n], out=mem[c : c + n])
+        memory.touch(c, n)
+    else:
+        x, y = memory.read_block(a, n), memory.read_block(b, n)
+        memory.write_block(c, [func(j, i) for i, j in zip(x, y)])
+
+
+def reduction(cpu, ins):
+    func, ufunc = REDUCTIONS[ins.opcode.name]
+    memory = cpu.memory
+    n = cpu.register.vl
+    base = get_address(cpu, ins.source)
+    memory.check(base, n)
+    if n == 0:
+        result = 0
+    else:
+        mem = view(memory)
+        if mem is not None:
+            result = int(getattr(mem[base : base + n], ufunc)())
+        else:
+            result = func(memory.read_block(base, n))
+    write_value(cpu, ins.target.type, ins.target.value, result)
+
+
+def VCMP(cpu, ins):
+    memory = cpu.memory
+    n = cpu.register.vl
+    a, b, c = (get_address(cpu, o) for o in (ins.source, ins.target, ins.parameter))
+    for base in (a, b, c):
+        memory.check(base, n)
+
+    mem = view(memory)
+    if mem is not None:
+        numpy.equal(
+            mem[a : a + n], mem[b : b + n], out=mem[c : c + n], casting="unsafe"
+        )
+        memory.touch(c, n)
+    else:
+        x, y = memory.read_block(a, n), memory.read_block(b, n)
+        memory.write_block(c, [int(i == j) for i, j in zip(x, y)])
+
+
+VADD = VSUB = VMUL = VAND = VXOR = elementwise
+VSUM = VMIN = VMAX = reduction
@@ -0,0 +1,273 @@
+import re
+from asimr.constant import InstructionSet, OperandType
+from asimr.decode import NO_OPERAND, lookup, numpy, tolist
+from asimr.instruction.dispatch import (
+    ENV,
+    SCOPE,
+    TEMPLATES,
+    environment,
+    statement,
+    operand_kind,
+    _READ,
+)
+
+# 条件跳转及其比较运算
+CONDITIONS = {
+    InstructionSet.JE: "==",
+    InstructionSet.JNE: "!=",
+    InstructionSet.JG: ">",
+    InstructionSet.JGE: ">=",
+    InstructionSet.JB: "<",
+    InstructionSet.JBE: "<=",
+}
+
+# 结束基本块的指令
+TERMINALS = set(CONDITIONS) | {
+    InstructionSet.JMP,
+    InstructionSet.JNZ,
+    InstructionSet.JZ,
+    InstructionSet.CALL,
+    InstructionSet.RET,
+    InstructionSet.HALT,
+}
+
+# 不会抛出异常、也不读取 pc/tc 的指令，执行前无需同步寄存器
+PURE = {
+    InstructionSet.NOP,
+    InstructionSet.MOV,
+    InstructionSet.ADD,
+    InstructionSet.SUB,
+    InstructionSet.MUL,
+    InstructionSet.AND,
+    InstructionSet.OR,
+    InstructionSet.XOR,
+    InstructionSet.NOT,
+    InstructionSet.SHL,
+    InstructionSet.SHR,
+    InstructionSet.POP,
+    InstructionSet.MSR,
+}
+
+MAX_BLOCK = 1024  # 单个基本块最多包含的指令数
+
+TERMINAL_CODES = [op.value for op in TERMINALS]
+# 跳转目标所在的操作数：(操作码, 操作数序号, 是否必须为立即数)
+TARGETS = [
+    ([InstructionSet.JNZ.value, InstructionSet.JZ.value], 1, False),
+    ([op.value for op in CONDITIONS], 2, True),
+    ([InstructionSet.JMP.value, InstructionSet.CALL.value], 0, True),
+]
+NUMBER = OperandType.Number.value
+
+
+class Block:
+    __slots__ = ("entry", "end", "func")
+
+    def __init__(self, entry, end, func):
+        self.entry = entry
+        self.end = end
+        self.func = func
+
+
+class JIT:
+    def __init__(self, cpu, threshold=16):
+        self.cpu = cpu
+        self.threshold = threshold  # 块入口执行多少次后编译
+        self.blocks = {}  # 入口 pc -> Block
+        self.counts = {}
+        self.leaders = set()
+        self.cold = set()  # 无法编译的入口
+        self.analyze()
+        # Core 在指令内存改写或追加指令块并重新解码之后才通知
+        cpu.watchers.append(self.invalidate)
+
+    def operands(self, ins):
+        operands = (ins.source, ins.target, ins.parameter)
+        kinds = "".join(operand_kind(self.cpu, o) for o in operands)
+        values = tuple(repr(o.value) if o is not None else "None" for o in operands)
+        return kinds, values
+
+    def read(self, kind, value):
+        return _READ[kind].format(value) if kind in _READ else None
+
+    def analyze(self, start=0, end=None):
+        # 在跳转/调用目标及控制流指令之后划分基本块，直接在 [start, end) 的列上计算
+        cols = self.cpu.code.columns(start, end)
+        if start == 0 and (end is None or end >= len(self.cpu.code)):
+            self.leaders = {0}
+        opcode, types, values = cols
+        if numpy is not None and isinstance(opcode, numpy.ndarray):
+            terminal = numpy.flatnonzero(lookup(TERMINAL_CODES)[opcode])
+            self.leaders.update((terminal + start + 1).tolist())
+            for codes, slot, number in TARGETS:
+                rows = terminal[lookup(codes)[opcode[terminal]]]
+                kinds = types[rows, slot]
+                # 跳转后 pc 还会自增，真正执行的是目标的下一条
+                keep = kinds == NUMBER if number else kinds != NO_OPERAND
+                self.leaders.update((values[rows[keep], slot] + 1).tolist())
+            return
+        opcode, types, values = (tolist(column) for column in cols)
+        for pc, op in enumerate(opcode, start):
+            if op not in TERMINAL_CODES:
+                continue
+            self.leaders.add(pc + 1)
+            row = pc - start
+            for codes, slot, number in TARGETS:
+                kind = types[row][slot]
+                if op in codes and (kind == NUMBER if number else kind != NO_OPERAND):
+                    self.leaders.add(values[row][slot] + 1)
+
+    def invalidate(self, address, length):
+        end = address + length
+        for entry, block in list(self.blocks.items()):
+            if block.entry < end and address < block.end:
+                del self.blocks[entry]
+        self.counts.clear()
+        self.cold.clear()
+        self.analyze(address, end)
+
+    def terminal(self, pc, ins, n, entry, sync):
+        """生成块末尾控制流指令的代码，返回代码行列表"""
+        kinds, values = self.operands(ins)
+        s, t, p = (self.read(k, v) for k, v in zip(kinds, values))
+        op = ins.opcode
+        leave = f"reg.tc = tc + {n}"
+
+        if op in CONDITIONS or op in (InstructionSet.JNZ, InstructionSet.JZ):
+            if op in CONDITIONS:
+                if None in (s, t, p):
+                    return None
+                cond, address = f"{s} {CONDITIONS[op]} {t}", p
+            else:
+                if s is None or ins.target is None:
+                    return None
+                cmp = "!=" if op == InstructionSet.JNZ else "=="
+                cond, address = f"{s} {cmp} 0", values[1]
+            # 条件不成立时顺序执行下一条
+            fall = [leave, f"return {pc + 1}"]
+            if address == repr(entry - 1):
+                # 跳回本块入口，直接在块内循环
+                return [f"if {cond}:", f"  tc += {n}", "  continue"] + fall
+            return [f"if {cond}:", f"  {leave}", f"  return {address} + 1"] + fall
+
+        if op == InstructionSet.JMP:
+            if s is None:
+                return None
+            if s == repr(entry - 1):
+                return [f"tc += {n}", "continue"]
+            return [leave, f"return {s} + 1"]
+
+        if op == InstructionSet.CALL:
+            if s is None:
+                return None
+            return sync + [f"stack.push({pc})", leave, f"return {s} + 1"]
+
+        if op == InstructionSet.RET:
+            return [leave, "return stack.pop() + 1"]
+
+        # HALT
+        return sync + [TEMPLATES[op]]
+
+    def generate(self, entry):
+        """从 entry 开始生成一个基本块的源码，返回 (源码, 结束位置)"""
+        code = self.cpu.code
+        lines = []
+        loop = False
+        pc = entry
+        while pc < len(code) and pc - entry < MAX_BLOCK:
+            if pc != entry and pc in self.leaders:
+                break
+            ins = code[pc]
+            n = pc - entry
+            sync = [f"reg.pc = {pc}", f"reg.tc = tc + {n}"]
+            if ins.opcode in TERMINALS:
+                tail = self.terminal(pc, ins, n + 1, entry, sync)
+                if tail is None:
+                    break
+                loop = any(line.strip() == "continue" for line in tail)
+                lines += tail
+                pc += 1
+                return self.wrap(lines, loop), pc
+            if ins.opcode not in TEMPLATES:
+                break
+            kinds, values = self.operands(ins)
+            body = statement(ins.opcode, kinds, values)
+            if body is None:
+                break
+            if ins.opcode not in PURE:
+                lines += sync
+            lines.append(body)
+            pc += 1
+
+        if pc == entry:
+            return None, pc
+        lines += [f"reg.tc = tc + {pc - entry}", f"return {pc}"]
+        return self.wrap(lines, loop), pc
+
+    def wrap(self, lines, loop):
+        # 块内用到的寄存器缓存为局部变量，离开块或可能抛出异常前写回
+        lines = [re.sub(r"gpr\[(\d+)\]", r"r\1", line) for line in lines]
+        used = sorted(
+            {int(n) for line in lines for n in re.findall(r"\br(\d+)\b", line)}
+        )
+        written = sorted(
+            {int(n) for line in lines for n in re.findall(r"\br(\d+) = ", line)}
+        )
+        store = "; ".join(f"gpr[{n}] = r{n}" for n in written)
+
+        indent = "    " if loop else "  "
+        src = f"def factory({ENV}):\n"
+        src += " def block():\n"
+        src += "  tc = reg.tc\n"
+        src += "".join(f"  r{n} = gpr[{n}]\n" for n in used)
+        if loop:
+            src += "  while True:\n"
+        for line in lines:
+            code = line.lstrip()
+            if store and code.startswith(("return", "reg.pc =")):
+                src += indent + line[: len(line) - len(code)] + store + "\n"
+            src += indent + line + "\n"
+        src += " return block\n"
+        return src
+
+    def compile(self, entry):
+        src, end = self.generate(entry)
+        if src is None:
+            return None
+        scope = dict(SCOPE)
+        exec(compile(src, f"<asim block {entry}>", "exec"), scope)
+        func = scope["factory"](*environment(self.cpu))
+        block = self.blocks[entry] = Block(entry, end, func)
+        return block
+
+    def run(self):
+        # 停机和等待网络 I/O 的处理与 Core.run 相同，返回 Status
+        return self.cpu.run(loop=self.loop)
+
+    def loop(self):
+        cpu = self.cpu
+        register = cpu.register
+        blocks = self.blocks
+        counts = self.counts
+        threshold = self.threshold
+        while True:
+            pc = register.pc
+            block = blocks.get(pc)
+            if block is not None:
+                register.pc = block.func()
+                continue
+
+            if pc in self.leaders and pc not in self.cold:
+                n = counts[pc] = counts.get(pc, 0) + 1
+                if n >= threshold:
+                    if self.compile(pc) is not None:
+                        continue
+                    self.cold.add(pc)
+
+            program = cpu.program
+            if pc < len(program):
+                program[pc]()
+            else:
+                cpu.run_ins(cpu.fetch(pc))
+            register.tc += 1
+            register.pc += 1
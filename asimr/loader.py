@@ -0,0 +1,25 @@
+import pickle
+import zstandard
+from asimr.constant import Program, ASIMError
+from asimr import acb
+
+
+def read_program(file) -> Program:
+    with open(file, "rb") as f:
+        magic = f.read(4)
+    if acb.is_acb(magic):
+        return acb.load(file)
+    if magic != b"zstd":
+        raise ASIMError("Invalid program file", {"File": file})
+    return read_legacy(file)
+
+
+def read_legacy(file) -> Program:
+    # 旧格式：b"zstd" + 压缩后的 pickle，只应加载可信的文件
+    with open(file, "rb") as f:
+        data = f.read()
+        data = zstandard.decompress(data[4:])
+        obj: Program = pickle.loads(data)
+    if not hasattr(obj, "lines"):  # 旧版本编译器生成的程序没有行号表
+        obj.lines = []
+    return obj
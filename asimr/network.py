@@ -0,0 +1,144 @@
+import asyncio
+import socket
+from asimr.constant import SyscallTable, Blocked, MemoryError
+
+# 参数块中每个字段占 4 个内存单元（每个单元一个字节，小端序）
+WORD = 4
+# 系统调用失败时返回 -1 而不是让 VM 出错：套接字错误、无效的 fd、
+# 超出范围的地址或端口、越界的缓冲区
+ERRORS = (OSError, KeyError, ValueError, OverflowError, MemoryError)
+
+
+class Network:
+    """一个 VM 的套接字表，网络系统调用在 asyncio 事件循环上完成
+
+    能立即完成的操作直接在非阻塞套接字上执行；需要等待时在事件循环上启动
+    协程，并抛出 Blocked 让出 CPU，调度器在协程完成后重新执行同一条 SYSCALL。
+    """
+
+    def __init__(self):
+        self.sockets = {}  # fd -> socket
+        self.next_fd = 3
+
+    def add(self, sock):
+        sock.setblocking(False)
+        fd = self.next_fd
+        self.next_fd += 1
+        self.sockets[fd] = sock
+        return fd
+
+    def call(self, cpu, number, params):
+        pending = cpu.pending
+        if pending is None:
+            name = SyscallTable(number).name
+            try:
+                result = getattr(self, name)(cpu, params)
+            except ERRORS:
+                result = -1
+            if asyncio.iscoroutine(result):
+                try:
+                    loop = asyncio.get_running_loop()
+                except RuntimeError:
+                    # 没有运行中的事件循环，交给调度器在事件循环中重试
+                    result.close()
+                    raise Blocked()
+                pending = cpu.pending = loop.create_task(result)
+        if pending is not None:
+            if not pending.done():
+                raise Blocked(pending.done)
+            cpu.pending = None
+            try:
+                result = pending.result()
+            except ERRORS:
+                result = -1
+        cpu.register.sr = result
+
+    def shutdown(self):
+        # VM 停机时关闭它打开的全部套接字
+        for sock in self.sockets.values():
+            sock.close()
+        self.sockets.clear()
+
+    # 参数块：socket 无参数；bind/connect 为 fd、IPv4 地址、端口；
+    # listen 为 fd、backlog；accept/close 为 fd；send/recv 为 fd、缓冲区地址、长度
+
+    def words(self, cpu, params, n):
+        data = cpu.memory.read_block(params, n * WORD)
+        return [
+            int.from_bytes(bytes(d & 0xFF for d in data[i : i + WORD]), "little")
+            for i in range(0, n * WORD, WORD)
+        ]
+
+    def address(self, cpu, params):
+        fd, _, port = self.words(cpu, params, 3)
+        ip = cpu.memory.read_block(params + WORD, WORD)
+        return self.sockets[fd], (".".join(str(b) for b in ip), port)
+
+    def socket(self, cpu, params):
+        return self.add(socket.socket(socket.AF_INET, socket.SOCK_STREAM))
+
+    def bind(self, cpu, params):
+        sock, address = self.address(cpu, params)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind(address)
+        return 0
+
+    def listen(self, cpu, params):
+        fd, backlog = self.words(cpu, params, 2)
+        self.sockets[fd].listen(backlog)
+        return 0
+
+    def accept(self, cpu, params):
+        (fd,) = self.words(cpu, params, 1)
+        sock = self.sockets[fd]
+        try:
+            conn, _ = sock.accept()
+            return self.add(conn)
+        except BlockingIOError:
+            return self.wait_accept(sock)
+
+    async def wait_accept(self, sock):
+        conn, _ = await asyncio.get_running_loop().sock_accept(sock)
+        return self.add(conn)
+
+    def connect(self, cpu, params):
+        sock, address = self.address(cpu, params)
+        return self.wait_connect(sock, address)
+
+    async def wait_connect(self, sock, address):
+        await asyncio.get_running_loop().sock_connect(sock, address)
+        return 0
+
+    def send(self, cpu, params):
+        fd, buffer, length = self.words(cpu, params, 3)
+        sock = self.sockets[fd]
+        data = bytes(cpu.memory.read_block(buffer, length))
+        try:
+            return sock.send(data)
+        except BlockingIOError:
+            return self.wait_send(sock, data)
+
+    async def wait_send(self, sock, data):
+        await asyncio.get_running_loop().sock_sendall(sock, data)
+        return len(data)
+
+    def recv(self, cpu, params):
+        fd, buffer, length = self.words(cpu, params, 3)
+        sock = self.sockets[fd]
+        cpu.memory.check(buffer, length)
+        try:
+            data = sock.recv(length)
+        except BlockingIOError:
+            return self.wait_recv(cpu, sock, buffer, length)
+        cpu.memory.write_block(buffer, data)
+        return len(data)
+
+    async def wait_recv(self, cpu, sock, buffer, length):
+        data = await asyncio.get_running_loop().sock_recv(sock, length)
+        cpu.memory.write_block(buffer, data)
+        return len(data)
+
+    def close(self, cpu, params):
+        (fd,) = self.words(cpu, params, 1)
+        self.sockets.pop(fd).close()
+        return 0
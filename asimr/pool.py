@@ -0,0 +1,133 @@
+import io
+import queue
+from dataclasses import dataclass, field
+from asimr.constant import Program, Status, ASIMError
+from asimr.core import Core
+from asimr.decode import columns, memory_range
+from asimr.device import Register, Memory, InstructionMemory, Stack, Console
+
+
+@dataclass
+class Result:
+    status: Status
+    exit_code: int = 0
+    output: str = ""
+    registers: list[int] = field(default_factory=list)
+    tc: int = 0
+    error: Exception = None
+
+
+class VMPool:
+    """预先分配好的一组 Core，用完后原地复位而不是重新分配
+
+    复位只清零写入过的数据内存，运行同一个程序时不重新解码和链接指令。
+    """
+
+    def __init__(
+        self,
+        size,
+        n_GPR=16,
+        data_mem=64 * 1024,
+        inst_mem=64 * 1024,
+        stack_size=64,
+        strict=False,
+    ):
+        self.n_GPR = n_GPR
+        self.data_mem = data_mem
+        self.inst_mem = inst_mem
+        self.stack_size = stack_size
+        self.free = queue.LifoQueue()  # 最近用过的 Core 优先，缓存更热
+        self.loaded = {}  # Core -> 已加载的程序
+        self.decoded = {}  # id(程序) -> (程序, 解码后的列, 内存操作数范围)
+        for _ in range(size):
+            cpu = Core(
+                Register(n_GPR),
+                Memory(data_mem, strict=strict),
+                InstructionMemory(inst_mem),
+                Stack(stack_size),
+                Console(stream=io.StringIO()),
+            )
+            self.free.put(cpu)
+
+    def check(self, program: Program):
+        if program.n_GPR > self.n_GPR:
+            raise ASIMError("Program needs more registers than the pool provides")
+        if len(program.instructions) > self.inst_mem:
+            raise ASIMError("Program does not fit in instruction memory")
+        if program.data_mem > self.data_mem:
+            raise ASIMError("Program needs more data memory than the pool provides")
+        # 栈大小小于等于 0 表示不限制
+        if self.stack_size > 0 and not 0 < program.stack_size <= self.stack_size:
+            raise ASIMError("Program needs a larger stack than the pool provides")
+
+    def limit(self, cpu: Core, program: Program):
+        # 寄存器数和栈深度按程序的设置，原地修改以免已链接的处理函数失效
+        gpr = cpu.register._GPR
+        if len(gpr) != program.n_GPR:
+            gpr[:] = [0] * program.n_GPR
+        stack = cpu.stack
+        if stack.size != program.stack_size:
+            stack.size = program.stack_size
+            stack.data[:] = [0] * max(program.stack_size, 0)
+
+    def decode(self, program: Program):
+        entry = self.decoded.get(id(program))
+        if entry is None or entry[0] is not program:
+            if len(self.decoded) >= 64:
+                self.decoded.clear()
+            cols = columns(program.instructions)
+            entry = (program, cols, memory_range(cols))
+            self.decoded[id(program)] = entry
+        return entry[1:]
+
+    def acquire(self, program: Program, timeout=None):
+        """取出一个加载好 program 的 Core，没有空闲的 Core 时等待"""
+        self.check(program)
+        cpu = self.free.get(timeout=timeout)
+        try:
+            self.limit(cpu, program)
+            if self.loaded.get(cpu) is not program:
+                cpu.load(program.instructions, *self.decode(program))
+                self.loaded[cpu] = program
+                cpu.info = program
+        except BaseException:
+            self.release(cpu)
+            raise
+        return cpu
+
+    def release(self, cpu: Core):
+        cpu.reset()
+        stream = cpu.console.stream
+        stream.seek(0)
+        stream.truncate()
+        self.free.put(cpu)
+
+    def run(self, program: Program, registers=None, memory=None, limit=None):
+        """在池中的 Core 上运行 program，返回 Result
+
+        registers 为 {编号: 值}，memory 为 {地址: 数据}；limit 为最多执行的指令数。
+        """
+        cpu = self.acquire(program)
+        try:
+            for n, value in (registers or {}).items():
+                cpu.register.set(n, value)
+            for address, data in (memory or {}).items():
+                cpu.memory.write_block(address, data)
+
+            result = Result(Status.HALTED)
+            try:
+                if limit is None:
+                    result.status = cpu.run()
+                else:
+                    result.status = cpu.step(limit)
+            except Exception as e:
+                result.status = Status.ERROR
+                result.error = e
+            cpu.shutdown()
+            result.exit_code = cpu.exit_code
+            result.output = cpu.console.stream.getvalue()
+            result.registers = cpu.register._GPR[:]
+            result.tc = cpu.register.tc
+            return result
+        finally:
+            self.release(cpu)
@@ -0,0 +1,177 @@
+import json
+import time
+from collections import Counter, defaultdict
+from asimr.constant import InstructionSet, Blocked
+
+I = InstructionSet
+
+# 统计耗时时使用的操作码分类
+CLASSES = {
+    "data": {I.MOV, I.EXC, I.MPC, I.MSR, I.MTC},
+    "arithmetic": {I.ADD, I.SUB, I.MUL, I.MOD},
+    "logic": {I.AND, I.OR, I.XOR, I.NOT, I.SHL, I.SHR},
+    "control": {
+        I.JMP,
+        I.JNZ,
+        I.JZ,
+        I.JE,
+        I.JG,
+        I.JGE,
+        I.JB,
+        I.JBE,
+        I.JNE,
+        I.CALL,
+        I.RET,
+        I.HALT,
+        I.NOP,
+    },
+    "stack": {I.PUSH, I.POP},
+    "io": {I.PNC, I.PAC, I.SYSCALL},
+    "vector": {
+        I.VLEN,
+        I.VADD,
+        I.VSUB,
+        I.VMUL,
+        I.VAND,
+        I.VXOR,
+        I.VSUM,
+        I.VMIN,
+        I.VMAX,
+        I.VCMP,
+    },
+    "memory": {I.MEMCPY, I.MEMSET, I.MEMCMP},
+}
+CLASS_OF = {op: name for name, ops in CLASSES.items() for op in ops}
+
+
+class Profile:
+    """按操作码、pc 和调用目标统计执行次数及耗时
+
+    与 Core.loop 分开实现，不开启时普通执行路径没有任何额外开销。
+    报告中的行号取自 Program.lines，是模板渲染后源码的行号，不是 .ac 模板中的行号；
+    需要对照时可以用 asimc -t acp 输出渲染后的源码。
+    """
+
+    def __init__(self, program=None):
+        self.program = program
+        self.pcs = Counter()  # pc -> 执行次数
+        self.opcodes = {}  # pc -> 操作码
+        self.times = defaultdict(float)  # 操作码 -> 秒
+        self.calls = Counter()  # 调用目标 -> 次数
+        self.pairs = Counter()  # 相邻执行的操作码对，格式与 PairProfile 相同
+        self.last = None  # 阻塞时上一条已执行指令的 (pc, 操作码)，恢复后接着统计
+        self.elapsed = 0.0
+
+    def run(self, cpu):
+        start = time.perf_counter()
+        try:
+            return cpu.run(loop=lambda: self.loop(cpu))
+        finally:
+            self.elapsed += time.perf_counter() - start
+
+    def loop(self, cpu):
+        code = cpu.code
+        program = cpu.program
+        register = cpu.register
+        pcs = self.pcs
+        opcodes = self.opcodes
+        times = self.times
+        calls = self.calls
+        pairs = self.pairs
+        clock = time.perf_counter
+        last, self.last = self.last, None
+        while True:
+            pc = register.pc
+            if pc < len(program):
+                op = code[pc].opcode
+                handler = program[pc]
+            else:
+                ins = cpu.fetch(pc)
+                op = ins.opcode
+                handler = lambda: cpu.run_ins(ins)
+            done = True
+            start = clock()
+            try:
+                handler()
+            except Blocked:
+                done = False  # 恢复后会重新执行这条指令，到那时再计数
+                self.last = last
+                raise
+            finally:
+                times[op] += clock() - start
+                # 指令执行完才计数，HALT 等以异常结束的指令也算在内
+                if done:
+                    if last is not None and last[0] == pc - 1:
+                        pairs[(last[1].name, op.name)] += 1
+                    pcs[pc] += 1
+                    opcodes[pc] = op
+            last = (pc, op)
+            if op is I.CALL:
+                calls[register.pc] += 1
+            register.tc += 1
+            register.pc += 1
+
+    def line(self, pc):
+        lines = getattr(self.program, "lines", None) or []
+        return lines[pc] if 0 <= pc < len(lines) else None
+
+    def label(self, target):
+        labels = getattr(self.program, "labels", None) or {}
+        for name, value in labels.items():
+            if value == target:
+                return name
+        return None
+
+    def report(self):
+        counts = Counter()
+        for pc, n in self.pcs.items():
+            counts[self.opcodes[pc]] += n
+
+        classes = {}
+        for op, n in counts.items():
+            c = classes.setdefault(CLASS_OF.get(op, "other"), {"count": 0, "time": 0.0})
+            c["count"] += n
+            c["time"] += self.times[op]
+
+        lines = Counter()
+        for pc, n in self.pcs.items():
+            line = self.line(pc)
+            if line is not None:
+                lines[line] += n
+
+        return {
+            "instructions": sum(self.pcs.values()),
+            "time": self.elapsed,
+            "opcodes": {
+                op.name: {"count": n, "time": self.times[op]}
+                for op, n in counts.most_common()
+            },
+            "classes": dict(
+                sorted(classes.items(), key=lambda c: c[1]["time"], reverse=True)
+            ),
+            "pcs": [
+                {
+                    "pc": pc,
+                    "line": self.line(pc),
+                    "opcode": self.opcodes[pc].name,
+                    "count": n,
+                }
+                for pc, n in self.pcs.most_common()
+            ],
+            "lines": [[line, n] for line, n in lines.most_common()],
+            # 跳转后 pc 还会自增，被调用的第一条指令在目标的下一条
+            "calls": [
+                {
+                    "target": target,
+                    "label": self.label(target),
+                    "line": self.line(target + 1),
+                    "count": n,
+                }
+                for target, n in self.calls.most_common()
+            ],
+            "pairs": [[a, b, n] for (a, b), n in self.pairs.most_common()],
+        }
+
+    def save(self, file):
+        with open(file, "w") as f:
+            json.dump(self.report(), f, indent=2)
@@ -0,0 +1,94 @@
+import asyncio
+import time
+from collections import deque
+from asimr.constant import Status
+
+
+class Task:
+    __slots__ = ("core", "name", "status", "error")
+
+    def __init__(self, core, name):
+        self.core = core
+        self.name = name
+        self.status = Status.READY
+        self.error = None
+
+    @property
+    def instructions(self):
+        return self.core.register.tc
+
+    def ready(self):
+        if self.status == Status.READY:
+            return True
+        if self.status == Status.BLOCKED:
+            waiting = self.core.waiting
+            return waiting is None or waiting()
+        return False
+
+
+class Scheduler:
+    """在一个进程内轮转执行多个 Core，每个 Core 每轮最多执行 quantum 条指令"""
+
+    def __init__(self, quantum=1000):
+        self.quantum = quantum
+        self.tasks = []
+        self.queue = deque()  # 尚未结束的任务
+
+    def add(self, core, name=None):
+        task = Task(core, name if name is not None else len(self.tasks))
+        self.tasks.append(task)
+        self.queue.append(task)
+        return task
+
+    def step(self):
+        """轮转一圈，返回本轮实际执行了时间片的任务数"""
+        ran = 0
+        for _ in range(len(self.queue)):
+            task = self.queue.popleft()
+            if not task.ready():
+                # 等待 I/O 的任务跳过，下一轮再检查
+                self.queue.append(task)
+                continue
+            ran += 1
+            try:
+                task.status = task.core.step(self.quantum)
+            except Exception as e:
+                task.status = Status.ERROR
+                task.error = e
+                task.core.shutdown()
+            if task.status in (Status.READY, Status.BLOCKED):
+                self.queue.append(task)
+        return ran
+
+    def idle(self):
+        # 所有任务都在等待时让出 CPU
+        time.sleep(0.001)
+
+    def run(self):
+        while self.queue:
+            if not self.step():
+                self.idle()
+        return self.stats()
+
+    async def run_async(self):
+        """在 asyncio 事件循环中运行，等待网络 I/O 的 VM 不会阻塞整个进程"""
+        while self.queue:
+            if self.step():
+                await asyncio.sleep(0)  # 让事件循环处理就绪的 I/O
+                continue
+            pending = [t.core.pending for t in self.queue if t.core.pending is not None]
+            if pending:
+                await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            else:
+                await asyncio.sleep(0.001)
+        return self.stats()
+
+    def stats(self):
+        return {
+            task.name: {
+                "status": task.status.name.lower(),
+                "instructions": task.instructions,
+                "error": str(task.error) if task.error is not None else None,
+            }
+            for task in self.tasks
+        }
@@ -0,0 +1,180 @@
+import json
+import mmap
+import struct
+from array import array
+from asimr.constant import Program, ASIMError
+from asimr.core import Core
+from asimr.device import Register, Memory, InstructionMemory, Stack, Console, TYPECODES
+
+MAGIC = b"ASNP"
+VERSION = 1
+HEADER = struct.Struct("<4sHHI")  # 魔数, 版本, 保留, 元数据长度
+MMAP_THRESHOLD = 1024 * 1024  # 超过此大小的数据内存在恢复时映射而不是复制
+
+
+def align(n):
+    granularity = mmap.ALLOCATIONGRANULARITY
+    return (n + granularity - 1) // granularity * granularity
+
+
+def pack(values):
+    """把整数序列编码为定宽的有符号小端字节，返回 (宽度, 字节)"""
+    try:
+        return 8, array("q", values).tobytes()
+    except OverflowError:  # 超出 int64 时按绝对值最大的数所需的字节数编码
+        width = max((v.bit_length() + 8) // 8 for v in values)
+        return width, b"".join(v.to_bytes(width, "little", signed=True) for v in values)
+
+
+def dump(cpu: Core, file, program: Program = None, pc=None, tc=None):
+    """把虚拟机的完整状态写入快照文件"""
+    cpu.console.flush()  # 快照之前的输出属于本次运行
+    cpu.pull()  # 流式加载时先读完剩余的指令
+    register = cpu.register
+    memory = cpu.memory
+    program = program or cpu.info or Program()
+    gpr_width, gpr = pack(register._GPR)
+    stack_width, stack = pack(cpu.stack.data)
+    if memory.strict:
+        memory_width, data = memory.width, bytes(memory.data)
+    else:
+        memory_width, data = pack(memory.data)
+    meta = {
+        "program": {
+            "data_mem": memory.size,
+            "inst_mem": cpu.instruction_memory.size,
+            "n_GPR": len(register._GPR),
+            "stack_size": cpu.stack.size,
+            "labels": program.labels,
+            "include_file": program.include_file,
+            "compilation_time": program.compilation_time,
+            "lines": list(program.lines),
+        },
+        "register": {
+            "pc": register.pc if pc is None else pc,
+            "sr": register.sr,
+            "tc": register.tc if tc is None else tc,
+            "vl": register.vl,
+            "struct": register._struct,
+        },
+        "memory": {
+            "strict": memory.strict,
+            "width": memory.width,
+            "encoding": memory_width,
+        },
+        "stack": {
+            "sp": cpu.stack.sp,
+            "length": len(cpu.stack.data),
+            "encoding": stack_width,
+        },
+        "encoding": gpr_width,
+        "instructions": len(cpu.instruction_memory.data),
+    }
+    meta = json.dumps(meta).encode()
+
+    with open(file, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 0, len(meta)))
+        f.write(meta)
+        f.write(gpr)
+        f.write(stack)
+        for inst in cpu.instruction_memory.data:
+            inst = inst or b""
+            f.write(len(inst).to_bytes(1, "little") + inst)
+
+        # 数据内存按分配粒度对齐，便于恢复时直接映射
+        f.write(b"\x00" * (align(f.tell()) - f.tell()))
+        # 末尾的零不写入，截断出的空洞在读取时同样为零
+        end = f.tell() + len(data)
+        f.write(data.rstrip(b"\x00"))
+        f.truncate(end)
+
+
+def read_array(f, n, width=8):
+    """读取 pack 写入的 n 个整数"""
+    if width == 8:
+        data = array("q")
+        data.frombytes(f.read(n * data.itemsize))
+        return data
+    raw = f.read(n * width)
+    return [
+        int.from_bytes(raw[i : i + width], "little", signed=True)
+        for i in range(0, len(raw), width)
+    ]
+
+
+def restore(file, console: Console = None, mmap_threshold=MMAP_THRESHOLD):
+    """从快照恢复虚拟机，返回 (Core, Program)"""
+    with open(file, "rb") as f:
+        magic, version, _, size = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ASIMError("Invalid snapshot", {"File": file})
+        meta = json.loads(f.read(size))
+        info = meta["program"]
+        program = Program(
+            data_mem=info["data_mem"],
+            inst_mem=info["inst_mem"],
+            n_GPR=info["n_GPR"],
+            stack_size=info["stack_size"],
+            labels=info["labels"],
+            include_file=info["include_file"],
+            compilation_time=info["compilation_time"],
+            lines=info.get("lines", []),
+        )
+
+        register = Register(program.n_GPR, meta["register"]["struct"])
+        register._GPR[:] = read_array(f, program.n_GPR, meta.get("encoding", 8))
+        register.pc = meta["register"]["pc"]
+        register.sr = meta["register"]["sr"]
+        register.tc = meta["register"]["tc"]
+        register.vl = meta["register"].get("vl", 0)
+
+        stack = Stack(program.stack_size)
+        stack.data[:] = read_array(
+            f,
+            meta["stack"].get("length", program.stack_size),
+            meta["stack"].get("encoding", 8),
+        )
+        stack.sp = meta["stack"]["sp"]
+
+        for _ in range(meta["instructions"]):
+            n = f.read(1)[0]
+            program.instructions.append(f.read(n) if n else 0)
+
+        offset = align(f.tell())
+        strict = meta["memory"]["strict"]
+        width = meta["memory"]["width"]
+        if not strict:
+            f.seek(offset)
+            memory = Memory(program.data_mem)
+            memory.data[:] = read_array(
+                f, program.data_mem, meta["memory"].get("encoding", 8)
+            )
+            memory.touch(0, program.data_mem)
+        elif program.data_mem * width >= mmap_threshold:
+            # 写时复制映射，修改不会写回快照文件
+            data = mmap.mmap(
+                f.fileno(),
+                program.data_mem * width,
+                offset=offset,
+                access=mmap.ACCESS_COPY,
+            )
+            if width > 1:
+                data = memoryview(data).cast(TYPECODES[width])
+            memory = Memory.from_buffer(data, width)
+        else:
+            f.seek(offset)
+            raw = f.read(program.data_mem * width)
+            if width == 1:
+                memory = Memory.from_buffer(bytearray(raw))
+            else:
+                memory = Memory.from_buffer(array(TYPECODES[width], raw), width)
+
+    cpu = Core(register, memory, InstructionMemory(program.inst_mem), stack, console)
+    cpu.load(program.instructions)
+    cpu.info = program
+    return cpu, program
+
+
+def is_snapshot(file):
+    with open(file, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
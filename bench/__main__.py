@@ -0,0 +1,308 @@
+"""ASIM 性能基准
+
+python -m bench                      运行全部基准并打印结果
+python -m bench -o result.json       保存结果
+python -m bench --compare base.json  与基线比较，有回退时返回非零退出码
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from queue import Empty
+from loguru import logger
+from asimc.funcs import funcs
+from asimc.parser import CodeParser
+from asimc.template import environment
+from asimc.translator import CppTranslator
+from asimr import acb
+from asimr.constant import __version__
+from asimr.core import Core
+from asimr.device import Register, Memory, InstructionMemory, Stack, Console
+from asimr.jit import JIT
+from asimr.loader import read_program
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PROGRAMS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "programs")
+
+# 每个程序的模板参数，quick 模式用于 CI 冒烟测试
+SIZES = {
+    "arith": ({"reps": 40}, {"reps": 4}),
+    "recursion": ({"reps": 100}, {"reps": 10}),
+    "memsweep": ({"reps": 200}, {"reps": 20}),
+    "print": ({"reps": 40}, {"reps": 4}),
+    "unrolled": ({"size": 20000}, {"size": 2000}),
+    "cpp_mem": ({"size": 20000}, {"size": 2000}),
+}
+INTERPRETED = ["arith", "recursion", "memsweep", "print", "unrolled"]
+
+# 指标名 -> 数值越大越好
+HIGHER_IS_BETTER = {
+    "ins_per_sec": True,
+    "lines_per_sec": True,
+    "seconds": False,
+    "peak_rss_mb": False,
+}
+
+
+def render(name, quick=False):
+    template = environment([PROGRAMS]).get_template(name + ".ac")
+    return template.render(**funcs, **SIZES[name][quick])
+
+
+def compile_source(source):
+    parser = CodeParser()
+    with contextlib.redirect_stdout(io.StringIO()):  # 解析器会打印标签定义
+        parser.parser(source.split("\n"))
+    return parser.out
+
+
+def make_core(program, console=None):
+    cpu = Core(
+        Register(program.n_GPR),
+        Memory(program.data_mem),
+        InstructionMemory(program.inst_mem),
+        Stack(program.stack_size),
+        console,
+    )
+    cpu.load(program.instructions)
+    return cpu
+
+
+def best(func, repeat):
+    # 取多次运行中最快的一次，减少噪声
+    return min(func() for _ in range(repeat))
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KB 为单位，macOS 以字节为单位
+    return rss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def bench_interp(name, quick, repeat, jit=False):
+    program = compile_source(render(name, quick))
+    devnull = open(os.devnull, "w")
+    count = 0
+
+    def once():
+        nonlocal count
+        cpu = make_core(program, Console(stream=devnull))
+        start = time.perf_counter()
+        if jit:
+            JIT(cpu).run()
+        else:
+            cpu.run()
+        elapsed = time.perf_counter() - start
+        count = cpu.register.tc
+        return elapsed
+
+    seconds = best(once, repeat)
+    devnull.close()
+    return {"seconds": seconds, "ins_per_sec": count / seconds}
+
+
+def bench_compile(quick, repeat):
+    source = render("unrolled", quick)
+    lines = source.count("\n") + 1
+    seconds = best(lambda: timed(compile_source, source), repeat)
+    return {"seconds": seconds, "lines_per_sec": lines / seconds}
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def bench_load(kind, quick, repeat):
+    program = compile_source(render("unrolled", quick))
+    with tempfile.TemporaryDirectory() as d:
+        file = os.path.join(d, "unrolled.acb")
+        if kind == "legacy":
+            import pickle
+            import zstandard
+
+            with open(file, "wb") as f:
+                f.write(b"zstd" + zstandard.compress(pickle.dumps(program)))
+        else:
+            acb.write(program, file, compress=kind != "mmap")
+
+        # 读取文件并加载到 Core，直到可以开始执行
+        def once():
+            start = time.perf_counter()
+            if kind == "stream":
+                header, chunks = acb.stream(file)
+                cpu = make_core(header)
+                cpu.stream(chunks)
+            else:
+                make_core(read_program(file))
+            return time.perf_counter() - start
+
+        return {"seconds": best(once, repeat)}
+
+
+def bench_cpp(quick, repeat):
+    compiler = shutil.which("g++") or shutil.which("clang++")
+    if compiler is None:
+        return {"skipped": "no C++ compiler found"}
+    program = compile_source(render("cpp_mem", quick))
+    with tempfile.TemporaryDirectory() as d:
+        source = os.path.join(d, "bench.cpp")
+        binary = os.path.join(d, "bench.out")
+        t = CppTranslator(program, True)
+        with open(source, "w") as f:
+            f.write(t.render())
+        t.tran(source, binary, True)
+
+        def run():
+            subprocess.run([binary], stdout=subprocess.DEVNULL, check=True)
+
+        seconds = best(lambda: timed(run), repeat)
+    return {"seconds": seconds, "ins_per_sec": len(program.instructions) / seconds}
+
+
+def cases(quick, repeat):
+    """基准名 -> 无参数的测量函数"""
+    table = {}
+    for name in INTERPRETED:
+        table[f"interp/{name}"] = (bench_interp, name, quick, repeat)
+        table[f"jit/{name}"] = (bench_interp, name, quick, repeat, True)
+    table["compile/unrolled"] = (bench_compile, quick, repeat)
+    for kind in ("legacy", "v2", "mmap", "stream"):
+        table[f"load/{kind}"] = (bench_load, kind, quick, repeat)
+    table["cpp/memory"] = (bench_cpp, quick, repeat)
+    return table
+
+
+def child(case, queue):
+    func, *args = case
+    try:
+        result = func(*args)
+        result["peak_rss_mb"] = peak_rss_mb()
+        queue.put(result)
+    except Exception as e:
+        queue.put({"error": f"{type(e).__name__}: {e}"})
+
+
+def run_case(case):
+    # 每个基准在单独的进程中运行，峰值内存互不影响
+    context = multiprocessing.get_context("fork" if os.name == "posix" else None)
+    queue = context.Queue()
+    process = context.Process(target=child, args=(case, queue))
+    process.start()
+    result = None
+    while result is None:
+        try:
+            result = queue.get(timeout=1)
+        except Empty:
+            # 子进程崩溃（段错误、被 OOM killer 杀死）时不会放入结果
+            if process.exitcode is not None and queue.empty():
+                result = {"error": f"crashed (exit code {process.exitcode})"}
+    process.join()
+    return {k: v for k, v in result.items() if v is not None}
+
+
+def compare(baseline, results, tolerance):
+    """返回回退的指标列表 [(基准, 指标, 基线值, 当前值)]"""
+    regressions = []
+    for name, old in baseline.get("results", {}).items():
+        new = results.get(name)
+        if new is None:
+            continue
+        for metric, higher in HIGHER_IS_BETTER.items():
+            if metric not in old or metric not in new:
+                continue
+            a, b = old[metric], new[metric]
+            if higher and b < a * (1 - tolerance):
+                regressions.append((name, metric, a, b))
+            elif not higher and b > a * (1 + tolerance):
+                regressions.append((name, metric, a, b))
+    return regressions
+
+
+def format_result(name, result):
+    if "skipped" in result or "error" in result:
+        return f"{name:24} {result.get('skipped') or result.get('error')}"
+    parts = [f"{name:24}", f"{result['seconds'] * 1000:10.2f} ms"]
+    for metric in ("ins_per_sec", "lines_per_sec"):
+        if metric in result:
+            parts.append(f"{result[metric]:14,.0f} {metric.split('_')[0]}/s")
+    if "peak_rss_mb" in result:
+        parts.append(f"{result['peak_rss_mb']:8.1f} MB")
+    return "  ".join(parts)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="bench", description="ASIM benchmarks.")
+    parser.add_argument("-o", "--output", type=str, help="Write results to this file.")
+    parser.add_argument(
+        "--compare", type=str, help="Baseline results to compare against."
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.15,
+        help="Allowed relative slowdown before a metric counts as a regression.",
+    )
+    parser.add_argument(
+        "-k", "--filter", type=str, default="", help="Only run matching benchmarks."
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Runs per benchmark, best is kept."
+    )
+    parser.add_argument("--quick", action="store_true", help="Use small inputs.")
+    args = parser.parse_args(argv)
+    logger.remove()  # 不输出编译时的调试日志
+
+    results = {}
+    for name, case in cases(args.quick, args.repeat).items():
+        if args.filter not in name:
+            continue
+        results[name] = run_case(case)
+        print(format_result(name, results[name]), flush=True)
+
+    data = {
+        "meta": {
+            "asim": __version__,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "quick": args.quick,
+            "time": int(time.time()),
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(data, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get("meta", {}).get("quick") != args.quick:
+            print("warning: baseline was recorded with a different --quick setting")
+        regressions = compare(baseline, results, args.tolerance)
+        for name, metric, old, new in regressions:
+            print(f"REGRESSION {name} {metric}: {old:.4g} -> {new:.4g}")
+        if regressions:
+            return 1
+        print("No regressions.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
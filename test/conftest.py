@@ -0,0 +1,29 @@
+import io
+from asimc.parser import CodeParser
+from asimr.core import Core
+from asimr.device import Register, Memory, InstructionMemory, Stack, Console
+
+
+def compile_source(code, *config):
+    """编译一段汇编源码，config 为加在源码之前的配置行，如 ".data_mem 256\" """
+    p = CodeParser()
+    p.parser(list(config) + code.split("\n"))
+    return p.out
+
+
+def make_core(code="", memory=None, stack=16, inst_mem=64, console=None):
+    """编译 code 并加载到一个新的 Core，编译结果保存在 cpu.info 中
+
+    默认使用 64 字节的严格内存，输出写入 StringIO 而不是标准输出。
+    """
+    cpu = Core(
+        Register(16),
+        memory if memory is not None else Memory(64, strict=True),
+        InstructionMemory(inst_mem),
+        Stack(stack),
+        console or Console(stream=io.StringIO()),
+    )
+    program = compile_source(code)
+    cpu.load(program.instructions)
+    cpu.info = program
+    return cpu
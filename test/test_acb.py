@@ -0,0 +1,137 @@
+import base64
+import pickle
+import pytest
+import zstandard
+from asimr import acb
+from asimr.constant import ASIMError, InstructionSet
+from asimr.core import Instruction
+from asimr.loader import read_program
+from conftest import compile_source, make_core
+
+CODE = """.n_GPR 8
+.stack_size 32
+MOV 1 r_1
+#loop
+NOP
+ADD 1 r_1 r_1
+JNE r_1 10 #loop
+HALT
+"""
+
+
+@pytest.mark.parametrize("compress", [True, False])
+def test_roundtrip(tmp_path, compress):
+    program = compile_source(CODE)
+    file = str(tmp_path / "a.acb")
+    acb.write(program, file, compress)
+    loaded = read_program(file)
+    assert list(loaded.instructions) == program.instructions
+    assert loaded.instructions[-1] == program.instructions[-1]
+    assert loaded.labels == program.labels
+    assert list(loaded.lines) == program.lines
+    assert (loaded.n_GPR, loaded.stack_size) == (8, 32)
+    assert loaded.compilation_time == program.compilation_time
+
+
+def test_mmap_table(tmp_path):
+    file = str(tmp_path / "a.acb")
+    acb.write(compile_source(CODE), file, compress=False)
+    program = acb.load(file)
+    # 未压缩的文件直接映射，指令表不复制
+    assert isinstance(program.instructions, acb.InstructionTable)
+    assert program.instructions.buffer.readonly
+    assert pickle.loads(pickle.dumps(program)).instructions == list(
+        program.instructions
+    )
+
+
+def test_mmap_backing(tmp_path):
+    # 映射的指令表直接作为指令内存的存储，改写时才复制
+    file = str(tmp_path / "a.acb")
+    acb.write(compile_source(CODE), file, compress=False)
+    program = acb.load(file)
+    cpu = make_core(inst_mem=256)
+    cpu.load(program.instructions)
+    assert cpu.instruction_memory.data is program.instructions
+    cpu.run()
+    assert cpu.register.get(1) == 10
+
+    cpu.instruction_memory.write(4, Instruction(InstructionSet.NOP).pack())
+    assert isinstance(cpu.instruction_memory.data, list)
+    assert cpu.code[4].opcode == InstructionSet.NOP
+    assert program.instructions[4] != cpu.instruction_memory.read(4)
+
+
+def test_fixed_width():
+    program = compile_source("HALT\nPNC 1\nJNE r_1 10 3\nADD 1 r_1 r_1")
+    table = acb.loads(acb.dumps(program, compress=False)).instructions
+    assert list(table) == program.instructions
+    assert [len(i) for i in table] == [16, 16, 16, 16]
+    assert [Instruction.unpack(i).opcode.name for i in table] == [
+        "HALT",
+        "PNC",
+        "JNE",
+        "ADD",
+    ]
+
+
+def test_legacy(tmp_path):
+    program = compile_source(CODE)
+    file = str(tmp_path / "old.acb")
+    with open(file, "wb") as f:
+        f.write(b"zstd" + zstandard.compress(pickle.dumps(program)))
+    assert read_program(file).instructions == program.instructions
+
+
+def test_include_v2():
+    data = acb.dumps(compile_source("PNC 1\nHALT"))
+    program = compile_source(".include_zstd x.acb " + base64.b85encode(data).decode())
+    assert len(program.instructions) == 2
+
+
+def test_invalid(tmp_path):
+    file = str(tmp_path / "bad.acb")
+    with open(file, "wb") as f:
+        f.write(b"nope" * 20)
+    with pytest.raises(ASIMError):
+        read_program(file)
+
+
+LONG = "\n".join(
+    ["MOV 0 r_1", "JMP 20"]  # 向前跳过尚未加载的块
+    + ["ADD 100 r_1 r_1"] * 19
+    + ["#loop", "NOP", "ADD 1 r_1 r_1", "JNE r_1 10 #loop", "HALT"]
+)
+
+
+@pytest.mark.parametrize("compress", [True, False])
+def test_stream(tmp_path, compress):
+    program = compile_source(LONG)
+    file = str(tmp_path / "long.acb")
+    acb.write(program, file, compress)
+
+    header, chunks = acb.stream(file, chunk=4)
+    assert header.labels == program.labels
+    assert len(header.lines) == 0
+    cpu = make_core(inst_mem=256)
+    cpu.stream(chunks)
+    assert len(cpu.code) == 4  # 只加载了第一块
+    cpu.run()
+    assert cpu.register.get(1) == 10
+    assert len(cpu.code) == len(program.instructions)
+
+    cpu.pull()
+    assert list(header.lines) == program.lines
+
+
+def test_stream_fusion_across_chunks(tmp_path):
+    file = str(tmp_path / "fuse.acb")
+    acb.write(compile_source("MOV 5 r_1\nADD 1 r_1 r_1\nADD 1 r_1 r_1\nHALT"), file)
+    _, chunks = acb.stream(file, chunk=1)
+    cpu = make_core(inst_mem=256)
+    cpu.pairs = {(InstructionSet.MOV, InstructionSet.ADD)}
+    cpu.stream(chunks)
+    cpu.pull(1)
+    assert cpu.handler(0).__code__.co_filename.startswith("<asim MOV+ADD")
+    cpu.run()
+    assert cpu.register.get(1) == 7
@@ -0,0 +1,57 @@
+from asimc.__main__ import out_acb
+from asimc.parser import Parser
+from asimr.batch import batch
+
+
+def test_batch_in_order(tmp_path):
+    file = str(tmp_path / "add.acb")
+    p = Parser("ADD r_0 &0x10 r_1\nPNC r_1\nMOV r_1 &0x11\nHALT")
+    p.parser()
+    out_acb(p, file, 3)
+
+    inputs = [
+        {"registers": {"r_0": i}, "memory": {"0x10": [100]}, "excerpt": [[16, 2]]}
+        for i in range(20)
+    ]
+    results = list(batch(file, inputs, jobs=2, chunksize=3))
+    assert [r["index"] for r in results] == list(range(20))
+    for i, r in enumerate(results):
+        assert r["status"] == "halt"
+        assert r["output"] == str(100 + i)
+        assert r["memory"] == {"16": [100, 100 + i]}
+        assert r["tc"] == 3
+
+
+def test_batch_error(tmp_path):
+    file = str(tmp_path / "div.acb")
+    p = Parser("MOD r_0 1 r_1\nHALT")
+    p.parser()
+    out_acb(p, file, 3)
+
+    inputs = [{"registers": {"r_0": 0}}, {"registers": {"r_0": 3}}, {}]
+    results = list(batch(file, inputs, jobs=1))
+    assert [r["status"] for r in results] == ["error", "halt", "error"]
+    assert results[1]["registers"][1] == 1
+
+
+def test_batch_exit_code(tmp_path):
+    file = str(tmp_path / "exit.acb")
+    p = Parser("SYSCALL 4 r_0\nHALT")
+    p.parser()
+    out_acb(p, file, 3)
+
+    results = list(batch(file, [{"registers": {"r_0": 3}}, {}], jobs=1))
+    assert [r["exit_code"] for r in results] == [3, 0]
+    assert [r["status"] for r in results] == ["halt", "halt"]
+
+
+def test_batch_blocked(tmp_path):
+    # 连接在工作进程中无法完成，报告为 blocked 而不是空的错误
+    file = str(tmp_path / "net.acb")
+    p = Parser("SYSCALL 12\nMSR r_1\nMOV r_1 &0x0\nSYSCALL 16 &0x0\nHALT")
+    p.parser()
+    out_acb(p, file, 3)
+
+    (result,) = batch(file, [{}], jobs=1)
+    assert result["status"] == "blocked"
+    assert "error" not in result
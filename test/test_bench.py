@@ -0,0 +1,54 @@
+import io
+import os
+from bench.__main__ import (
+    INTERPRETED,
+    compare,
+    compile_source,
+    make_core,
+    render,
+    run_case,
+)
+from asimr.device import Console
+import pytest
+
+
+@pytest.mark.parametrize("name", INTERPRETED)
+def test_programs_halt(name):
+    program = compile_source(render(name, quick=True))
+    cpu = make_core(program, Console(stream=io.StringIO()))
+    cpu.run()
+    assert cpu.register.tc > 1000
+
+
+def test_recursion_depth():
+    cpu = make_core(compile_source(render("recursion", quick=True)))
+    cpu.run()
+    assert cpu.register.get(1) == 200 * 10 & 0xFF
+    assert cpu.stack.sp == 0
+
+
+def test_compare():
+    baseline = {
+        "results": {
+            "interp/a": {"ins_per_sec": 1000, "seconds": 1.0, "peak_rss_mb": 30},
+            "load/b": {"seconds": 1.0},
+            "gone": {"seconds": 1.0},
+        }
+    }
+    results = {
+        "interp/a": {"ins_per_sec": 800, "seconds": 1.1, "peak_rss_mb": 40},
+        "load/b": {"seconds": 0.5},
+    }
+    assert compare(baseline, results, 0.15) == [
+        ("interp/a", "ins_per_sec", 1000, 800),
+        ("interp/a", "peak_rss_mb", 30, 40),
+    ]
+    assert compare(baseline, results, 0.5) == []
+
+
+def crash(code):
+    os._exit(code)
+
+
+def test_run_case_crash():
+    assert run_case((crash, 3)) == {"error": "crashed (exit code 3)"}
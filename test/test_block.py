@@ -0,0 +1,112 @@
+import asimc
+from asimc.translator import CppTranslator
+from asimr.constant import MemoryError
+from asimr.core import Instruction
+from asimr.device import Memory
+import os
+import shutil
+import subprocess
+import pytest
+from conftest import compile_source, make_core
+
+
+@pytest.mark.parametrize(
+    "memory",
+    [Memory(64), Memory(64, strict=True), Memory(64, strict=True, width=2)],
+)
+def test_memcpy_memset(memory):
+    cpu = make_core("MEMCPY &0x0 &0x10 4\nMEMSET 7 &0x20 3\nHALT", memory)
+    cpu.memory.write_block(0, [1, 2, 3, 4])
+    cpu.run()
+    assert list(cpu.memory.read_block(0x10, 4)) == [1, 2, 3, 4]
+    assert list(cpu.memory.read_block(0x20, 4)) == [7, 7, 7, 0]
+
+
+@pytest.mark.parametrize("memory", [Memory(16), Memory(16, strict=True, width=4)])
+def test_memcpy_overlap(memory):
+    memory.write_block(0, [1, 2, 3, 4, 5])
+    memory.move(0, 2, 5)
+    assert list(memory.read_block(0, 7)) == [1, 2, 1, 2, 3, 4, 5]
+    memory.move(2, 0, 5)
+    assert list(memory.read_block(0, 7)) == [1, 2, 3, 4, 5, 4, 5]
+
+
+def test_memset_mask():
+    memory = Memory(8, strict=True)
+    memory.fill(0, 0x1FF, 2)
+    assert list(memory.read_block(0, 3)) == [0xFF, 0xFF, 0]
+
+
+def test_memcmp():
+    cpu = make_core(
+        "MEMCMP &0x0 &0x10 4\nMSR r_1\nMEMCMP &0x0 &0x20 4\nMSR r_2\n"
+        "MEMCMP &0x0 &0x0 4\nMSR r_3\nHALT"
+    )
+    cpu.memory.write_block(0x0, [1, 2, 3, 4])
+    cpu.memory.write_block(0x10, [1, 2, 4, 0])
+    cpu.memory.write_block(0x20, [1, 2, 2, 9])
+    cpu.run()
+    assert cpu.register.get(1) == 0xFF  # -1 截断为 8 位
+    assert cpu.register.get(2) == 1
+    assert cpu.register.get(3) == 0
+
+
+def test_register_address():
+    cpu = make_core("MOV 0x30 r_1\nMEMSET 5 r_1 2\nHALT")
+    cpu.run()
+    assert list(cpu.memory.read_block(0x30, 3)) == [5, 5, 0]
+
+
+def test_out_of_range():
+    # 整个区间在执行前检查，越界时不写入任何数据
+    cpu = make_core("MEMSET 1 &0x3E 4\nHALT")
+    with pytest.raises(MemoryError):
+        cpu.run()
+    assert list(cpu.memory.read_block(0x3E, 2)) == [0, 0]
+
+
+def test_translator():
+    p = compile_source("MEMCPY &0x0 r_1 16\nMEMSET 0 &0x8 r_2\nMEMCMP &0x0 &0x8 4")
+    t = CppTranslator.__new__(CppTranslator)
+    items = [
+        getattr(t, "inst_" + Instruction.unpack(i).opcode.name)(Instruction.unpack(i))
+        for i in p.instructions
+    ]
+    assert items == [
+        "asim_mem.move(0, asim_reg.gpr[1], 16);",
+        "asim_mem.fill(8, 0, asim_reg.gpr[2]);",
+        "asim_reg.sr = asim_mem.compare(0, 8, 4);",
+    ]
+
+
+def test_memcmp_backends(tmp_path):
+    # 解释器和 C++ 后端的状态寄存器都是有符号的，比较结果一致
+    compiler = shutil.which("g++") or shutil.which("clang++")
+    if compiler is None:
+        pytest.skip("no C++ compiler found")
+    t = CppTranslator.__new__(CppTranslator)
+    left = [1, 200, 3]
+    lines = [f"asim_mem.write({i}, {v});" for i, v in enumerate(left)]
+    expected = []
+    for right in ([1, 200, 3], [1, 2, 9], [1, 201, 0]):
+        cpu = make_core("MEMCMP &0x0 &0x10 3\nHALT")
+        cpu.memory.write_block(0x0, left)
+        cpu.memory.write_block(0x10, right)
+        cpu.run()
+        expected.append(cpu.register.sr)
+        lines += [f"asim_mem.write({0x10 + i}, {v});" for i, v in enumerate(right)]
+        lines.append(t.inst_MEMCMP(cpu.code[0]))
+        lines.append("std::cout << asim_reg.sr << std::endl;")
+    assert expected == [0, 1, -1]
+
+    source = tmp_path / "memcmp.cpp"
+    source.write_text(
+        '#include "asim.hpp"\n#include <iostream>\n'
+        "Memory asim_mem(64);\nRegister asim_reg(16);\n"
+        "int main() {\n" + "\n".join(lines) + "\n}\n"
+    )
+    include = os.path.join(os.path.dirname(asimc.__file__), "templates", "cpp")
+    binary = str(tmp_path / "memcmp")
+    subprocess.run([compiler, "-I", include, "-o", binary, str(source)], check=True)
+    output = subprocess.run([binary], stdout=subprocess.PIPE, check=True).stdout
+    assert [int(line) for line in output.split()] == expected
@@ -0,0 +1,92 @@
+import concurrent.futures
+import multiprocessing
+import os
+import pytest
+import asimc.funcs as asim_f
+from asimc.cache import DiskCache
+from asimc.parser import CodeParser, Fragment, parse_chunk
+from asimr.constant import tmp
+from asimr.core import Instruction
+
+LIB = """#print
+NOP
+PNC r_1
+JMP #back
+"""
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = DiskCache(str(tmp_path / "cache"))
+    (tmp_path / "lib.ac").write_text(LIB)
+    tmp["inc_dir"] = [str(tmp_path)]
+    tmp["cache"] = cache
+    yield cache
+    tmp["cache"] = None
+
+
+def test_get_put(tmp_path):
+    cache = DiskCache(str(tmp_path))
+    key = cache.key("a", b"b")
+    assert key != cache.key("ab")
+    assert cache.get(key) is None
+    cache.put(key, b"data")
+    assert cache.get(key) == b"data"
+    assert cache.stats["hits"] == 1
+    assert cache.stats["misses"] == 1
+
+
+def test_evict(tmp_path):
+    cache = DiskCache(str(tmp_path), max_size=350)
+    for i in range(3):
+        cache.put(str(i), bytes(100))
+        os.utime(cache.path(str(i)), (i, i))
+    cache.read("0")  # 最近使用，不被淘汰
+    cache.put("3", bytes(100))
+    assert cache.read("1") is None
+    assert cache.read("0") is not None
+    assert cache.read("2") is not None
+    assert cache.stats["evictions"] == 1
+
+
+def test_fragment_roundtrip():
+    p = CodeParser(relocatable=True)
+    p.parser(LIB.split("\n"))
+    fragment = Fragment.loads(p.fragment().dumps())
+    assert fragment.program.instructions == p.out.instructions
+    assert fragment.program.labels == {"print": 0}
+    assert fragment.relocations == [(2, 0, "back", 4)]
+
+
+def test_include(cache):
+    text = asim_f.include("lib")
+    assert text.startswith(".include_cached")
+    assert cache.stats["misses"] == 1
+    assert asim_f.include("lib") == text
+    assert cache.stats["hits"] == 1
+
+    # include 中的标签可以与主文件的标签互相引用
+    p = CodeParser(compile_cache=cache)
+    p.parser(["JMP #print", "#back", text.strip(), "HALT"])
+    code = [Instruction.unpack(i) for i in p.out.instructions]
+    assert code[0].source.value == 1
+    assert code[3].source.value == 1
+    assert p.out.lines == [1, 3, 3, 3, 4]
+
+
+def test_include_evicted(cache):
+    # 条目被淘汰后重新解析被引入的文件
+    text = asim_f.include("lib")
+    cache.clear()
+    p = CodeParser(compile_cache=cache)
+    p.parser(["#back", text.strip()])
+    assert len(p.out.instructions) == 3
+
+
+def test_include_spawn(cache):
+    # spawn 启动的工作进程没有继承全局状态，也能读取缓存
+    code = "\n".join(["#back", asim_f.include("lib").strip()] + ["NOP"] * 20)
+    context = multiprocessing.get_context("spawn")
+    with concurrent.futures.ProcessPoolExecutor(2, mp_context=context) as executor:
+        fragment = executor.submit(parse_chunk, code, 1, cache).result()
+    assert len(fragment.program.instructions) == 23
@@ -0,0 +1,152 @@
+import io
+from asimr.constant import SyscallTable
+from asimr.core import Instruction, InstructionSet
+from asimr.device import Console
+from asimr.instruction.dispatch import link
+from asimr.fusion import PairProfile, select
+import pytest
+from conftest import compile_source, make_core
+
+
+def test_load_predecode():
+    cpu = make_core("MOV 1 r_1\nADD 1 r_1 r_2")
+    assert len(cpu.code) == 2
+    assert isinstance(cpu.code[0], Instruction)
+    assert cpu.code[1].opcode == InstructionSet.ADD
+    assert all(callable(h) for h in cpu.program)
+
+
+def test_run_loop():
+    code = """
+MOV 0 r_0
+#loop
+NOP
+ADD 1 r_0 r_0
+JNE r_0 10 #loop
+MOV r_0 &0x1
+HALT
+"""
+    cpu = make_core(code)
+    cpu.run()
+    assert cpu.register.get(0) == 10
+    assert cpu.memory.read(1) == 10
+
+
+def test_run_past_end():
+    # 超出程序末尾时读到空指令，等同于 HALT
+    cpu = make_core("MOV 5 r_0")
+    cpu.run()
+    assert cpu.register.get(0) == 5
+
+
+@pytest.mark.parametrize(
+    "line",
+    [
+        "ADD r_1 r_2 r_3",
+        "SUB 7 r_2 r_3",
+        "MUL r_1 9 &0x3",
+        "MOD 3 &0x2 r_3",
+        "XOR &0x1 &0x2 &0x3",
+        "SHL 2 r_2 r_3",
+        "NOT r_2 &0x3",
+        "MOV 300 r_3",
+        "MOV &0x100 r_3",
+        "MPC &0x3",
+    ],
+)
+def test_specialized_matches_generic(line):
+    # 特化后的处理函数与通用处理函数结果一致
+    results = []
+    for specialize in (True, False):
+        cpu = make_core(line)
+        for n, v in enumerate((0, 5, 200)):
+            cpu.register.set(n, v)
+            cpu.memory.write(n, v)
+        ins = cpu.code[0]
+        try:
+            if specialize:
+                cpu.handler(0)()
+            else:
+                cpu.run_ins(ins)
+        except Exception as e:
+            results.append(type(e))
+            continue
+        results.append((cpu.register._GPR[:], cpu.memory.data[:8]))
+    assert results[0] == results[1]
+
+
+FUSE_LOOP = """
+MOV 0 r_0
+MOV 0 r_1
+#loop
+NOP
+ADD 1 r_0 r_0
+ADD r_0 r_1 r_1
+JNE r_0 10 #loop
+HALT
+"""
+
+
+def test_fused_matches_plain():
+    profile = PairProfile()
+    cpu = make_core(FUSE_LOOP)
+    profile.run(cpu)
+    pairs = select(profile.counts)
+    assert (InstructionSet.ADD, InstructionSet.ADD) in pairs
+
+    fused = make_core("")
+    fused.pairs = pairs
+    fused.load(compile_source(FUSE_LOOP).instructions)
+    assert fused.program[3] is not cpu.program[3]
+    fused.run()
+    assert fused.register._GPR == cpu.register._GPR
+    assert fused.register.tc == cpu.register.tc
+
+
+def test_step_fused_pair():
+    # 单步执行时超级指令不会一次执行两条
+    cpu = make_core("")
+    cpu.pairs = {(InstructionSet.ADD, InstructionSet.ADD)}
+    cpu.load(compile_source(FUSE_LOOP).instructions)
+    for tc in range(1, 5):
+        cpu.step(1)
+        assert cpu.register.tc == tc
+    assert cpu.register.get(0) == 1
+    assert cpu.register.get(1) == 0
+    cpu.step(1)
+    assert cpu.register.get(1) == 1
+
+
+def test_jump_into_fused_pair():
+    # 跳转到超级指令的后半部分时只执行后一条
+    code = """
+MOV 0 r_0
+JMP 2
+MOV 100 r_0
+ADD 1 r_0 r_0
+HALT
+"""
+    cpu = make_core("")
+    cpu.pairs = {(InstructionSet.MOV, InstructionSet.ADD)}
+    cpu.load(compile_source(code).instructions)
+    cpu.run()
+    assert cpu.register.get(0) == 1
+
+
+def test_halt_flushes_console():
+    out = io.StringIO()
+    cpu = make_core("PNC 42\nPAC 33\nHALT\nPNC 1", console=Console(stream=out))
+    cpu.program = [link(cpu, ins) for ins in cpu.code]
+    cpu.run()
+    assert out.getvalue() == "42!"
+
+
+def test_syscall_flush():
+    out = io.StringIO()
+    code = f"PNC 7\nSYSCALL {SyscallTable.flush.value}\nPNC 8"
+    cpu = make_core(code, console=Console(stream=out))
+    cpu.program = [link(cpu, ins) for ins in cpu.code]
+    cpu.program[0]()
+    assert out.getvalue() == ""
+    cpu.program[1]()
+    assert out.getvalue() == "7"
@@ -0,0 +1,113 @@
+import pytest
+from asimr import acb, decode
+from asimr.constant import InstructionSet, OperandType
+from asimr.core import Instruction
+from conftest import compile_source
+
+CODE = """MOV 1 r_1
+#loop
+NOP
+ADD 1 r_1 r_1
+MOV r_1 &0x20
+PNC 65
+JNE r_1 10 #loop
+HALT
+"""
+
+
+def same(a, b):
+    assert [str(i) for i in a] == [str(i) for i in b]
+
+
+@pytest.fixture(params=[True, False])
+def use_numpy(request, monkeypatch):
+    if not request.param:
+        monkeypatch.setattr(decode, "numpy", None)
+    elif decode.numpy is None:
+        pytest.skip("NumPy is not installed")
+    return request.param
+
+
+def test_decode(use_numpy):
+    instructions = compile_source(CODE).instructions
+    same(decode.decode(instructions), map(Instruction.unpack, instructions))
+
+
+def test_columns(use_numpy):
+    cols = decode.columns(compile_source(CODE).instructions)
+    assert decode.tolist(cols.opcode)[:3] == [
+        InstructionSet.MOV.value,
+        InstructionSet.NOP.value,
+        InstructionSet.ADD.value,
+    ]
+    types = decode.tolist(cols.type)
+    assert list(types[0]) == [
+        OperandType.Number.value,
+        OperandType.Register.value,
+        0xFF,
+    ]
+    assert list(decode.tolist(cols.value)[3][:2]) == [1, 0x20]
+    assert decode.memory_range(cols) == (0x20, 0x21)
+
+
+def test_shared_operands():
+    code = decode.decode(compile_source("ADD 1 r_1 r_1\nADD 1 r_1 r_1").instructions)
+    assert code[0].source is code[1].source
+    assert code[0].target is code[0].parameter
+
+
+def test_legacy():
+    # 旧的变长编码与定长编码混在一起
+    instructions = compile_source(CODE).instructions
+    legacy = [instructions[0], bytes([InstructionSet.PNC.value, 2]) + b"A\0\0\0"]
+    code = decode.decode(legacy)
+    assert code[1].opcode == InstructionSet.PNC
+    assert code[1].source.value == 65
+    assert code[1].target is None
+
+
+def test_table():
+    # v2 的指令表直接作为缓冲区使用
+    table = acb.loads(acb.dumps(compile_source(CODE), compress=False)).instructions
+    assert decode.to_buffer(table) is table.buffer
+    same(decode.decode(table), map(Instruction.unpack, table))
+
+
+def test_invalid_opcode(use_numpy):
+    with pytest.raises(ValueError):
+        decode.decode([b"\xfe" + b"\xff\0\0\0\0" * 3])
+
+
+def test_code_lazy(use_numpy, monkeypatch):
+    monkeypatch.setattr(decode, "BLOCK", 4)
+    instructions = compile_source(CODE).instructions
+    code = decode.Code(decode.columns(instructions))
+    code.append(decode.columns(instructions))
+    assert len(code) == 2 * len(instructions)
+    # 只创建被访问的指令所在的块，块从每段列的起点开始划分
+    assert code[9].opcode == InstructionSet.ADD
+    assert None not in code.items[7:11]
+    assert code.items[:7] == [None] * 7
+    assert code.items[11] is None
+    same(code, decode.decode(instructions * 2))
+
+
+def test_code_columns(use_numpy):
+    instructions = compile_source(CODE).instructions
+    code = decode.Code(decode.columns(instructions[:3]))
+    code.append(decode.columns(instructions[3:]))
+    cols = code.columns(2, 5)
+    assert decode.tolist(cols.opcode) == decode.tolist(
+        decode.columns(instructions[2:5]).opcode
+    )
+    # 改写过的指令按新内容给出
+    code[3] = Instruction(InstructionSet.NOP)
+    assert decode.tolist(code.columns(2, 5).opcode)[1] == InstructionSet.NOP.value
+    assert decode.memory_range(code.columns(0, 3)) is None
+
+
+def test_validate(use_numpy):
+    decode.validate(decode.columns(compile_source(CODE).instructions))
+    bad = compile_source(CODE).instructions + [b"\x02\x07" + bytes(14)]
+    with pytest.raises(ValueError, match="at 7"):
+        decode.validate(decode.columns(bad))
@@ -1,4 +1,5 @@
-from asimr.device import Memory, Stack, Register
+import io
+from asimr.device import Memory, InstructionMemory, Stack, Register, Console
 from asimr.constant import MemoryError, ASIMError
 import pytest
 
@@ -61,6 +62,14 @@ def test_stack_overflow():
         stack.push(20)  # 尝试在满栈上推入元素
 
 
+def test_stack_unbounded():
+    stack = Stack(size=0)
+    for i in range(100):
+        stack.push(i)
+    assert stack.sp == 100
+    assert stack.pop() == 99
+
+
 def test_stack_underflow():
     stack = Stack()
     assert stack.pop() == 0  # 尝试在空栈上弹出元素
@@ -91,3 +100,83 @@ def test_out_of_range_register_get():
     reg = Register()
     with pytest.raises(ASIMError):
         reg.get(32)  # 尝试获取一个不存在的寄存器
+
+
+def test_strict_memory_backing():
+    mem = Memory(8, strict=True)
+    assert isinstance(mem.data, bytearray)
+    mem.write(0, 0x1FF)  # 严格模式下截断为8位
+    assert mem.read(0) == 0xFF
+
+
+def test_strict_memory_width():
+    mem = Memory(8, strict=True, width=2)
+    mem.write(1, 0x12345)
+    assert mem.read(1) == 0x2345
+    assert mem.data.itemsize == 2
+
+
+def test_memory_block():
+    mem = Memory(8, strict=True)
+    mem.write_block(2, [1, 2, 300])
+    assert mem.read_block(2, 3) == bytearray([1, 2, 44])
+    mem.write_block(0, b"\x07\x08")
+    assert list(mem.read_block(0, 4)) == [7, 8, 1, 2]
+
+
+def test_memory_block_out_of_bounds():
+    mem = Memory(8, strict=True)
+    with pytest.raises(MemoryError):
+        mem.read_block(6, 4)
+    with pytest.raises(MemoryError):
+        mem.write_block(-1, [1])
+
+
+def test_instruction_memory_bulk_load():
+    mem = InstructionMemory(16)
+    mem.write_block(0, [b"\x01", b"\x02"])
+    assert len(mem.data) == 2
+    assert mem.read(1) == b"\x02"
+    assert mem.read(10) == 0  # 未写入的部分为空指令
+
+
+def test_instruction_memory_grow():
+    mem = InstructionMemory(16)
+    mem.write_block(0, [b"\x01"])
+    mem.write(4, b"\x05")
+    assert mem.data == [b"\x01", 0, 0, 0, b"\x05"]
+    with pytest.raises(MemoryError):
+        mem.write(16, b"\x00")
+    with pytest.raises(MemoryError):
+        mem.write_block(15, [b"\x00", b"\x00"])
+
+
+def test_stack_pointer():
+    stack = Stack(size=4)
+    stack.push(1)
+    stack.push(2)
+    assert stack.sp == 2
+    stack.pop()
+    assert stack.sp == 1
+    stack.pop()
+    stack.pop()  # 空栈弹出不移动栈指针
+    assert stack.sp == 0
+
+
+def test_console_buffer():
+    out = io.StringIO()
+    console = Console(buffer_size=4, stream=out)
+    console.write("ab")
+    assert out.getvalue() == ""
+    console.write("cd")  # 缓冲区满时写出
+    assert out.getvalue() == "abcd"
+    console.write("e")
+    console.flush()
+    assert out.getvalue() == "abcde"
+
+
+def test_console_unbuffered():
+    out = io.StringIO()
+    console = Console(buffer_size=0, stream=out)
+    console.write("a")
+    assert out.getvalue() == "a"
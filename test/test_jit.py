@@ -0,0 +1,109 @@
+from asimr.core import Instruction, Operand
+from asimr.constant import InstructionSet, OperandType
+import asimr.jit as jit_module
+from asimr.jit import JIT
+import pytest
+from conftest import compile_source, make_core
+
+LOOP = """
+MOV 0 r_1
+#outer
+NOP
+MOV 0 r_0
+#inner
+NOP
+ADD 1 r_0 r_0
+ADD r_0 &0x2 &0x2
+JNE r_0 20 #inner
+PUSH r_1
+POP r_3
+ADD 1 r_1 r_1
+JB r_1 5 #outer
+MTC &0x1
+HALT
+"""
+
+
+def state(cpu):
+    return cpu.register._GPR[:], bytes(cpu.memory.data), cpu.register.tc
+
+
+def test_jit_matches_interpreter():
+    cpu = make_core(LOOP)
+    cpu.run()
+
+    jit_cpu = make_core(LOOP)
+    jit = JIT(jit_cpu, threshold=1)
+    jit.run()
+    assert jit.blocks
+    assert state(jit_cpu) == state(cpu)
+
+
+def test_jit_call_ret():
+    code = """
+MOV 3 r_0
+JMP 5
+#func
+NOP
+ADD r_0 r_1 r_1
+RET
+NOP
+CALL #func
+CALL #func
+HALT
+"""
+    cpu = make_core(code)
+    JIT(cpu, threshold=1).run()
+    assert cpu.register.get(1) == 6
+
+
+def test_jit_invalidate():
+    cpu = make_core("MOV 1 r_0\nADD 1 r_0 r_0\nHALT")
+    jit = JIT(cpu, threshold=1)
+    jit.run()
+    assert cpu.register.get(0) == 2
+
+    # 改写指令内存后，覆盖该地址的块需要重新编译
+    add = Instruction(
+        InstructionSet.ADD,
+        Operand(5, OperandType.Number),
+        Operand(0, OperandType.Register),
+        Operand(0, OperandType.Register),
+    )
+    cpu.instruction_memory.write(1, add.pack())
+    assert not jit.blocks
+    cpu.register.pc = 0
+    jit.run()
+    assert cpu.register.get(0) == 6
+
+
+def test_jit_extend():
+    # 流式加载追加的指令块中的跳转目标也是块入口
+    instructions = compile_source(LOOP).instructions
+    cpu = make_core("")
+    jit = JIT(cpu)
+    cpu.stream([instructions[:4], instructions[4:]])
+    cpu.pull()
+    assert jit.leaders == JIT(make_core(LOOP)).leaders
+
+
+@pytest.mark.parametrize("use_numpy", [True, False])
+def test_analyze_columns(use_numpy, monkeypatch):
+    # 在列上划分的基本块与逐条检查指令的结果相同
+    if not use_numpy:
+        monkeypatch.setattr(jit_module, "numpy", None)
+    cpu = make_core(LOOP + "CALL #outer\nJNZ r_0 #inner\nJMP r_1\n")
+    expected = {0}
+    for pc, ins in enumerate(cpu.code):
+        if ins.opcode not in jit_module.TERMINALS:
+            continue
+        expected.add(pc + 1)
+        target = {
+            InstructionSet.JNE: ins.parameter,
+            InstructionSet.JB: ins.parameter,
+            InstructionSet.CALL: ins.source,
+            InstructionSet.JNZ: ins.target,
+        }.get(ins.opcode)
+        if target is not None:
+            expected.add(target.value + 1)
+    assert JIT(cpu).leaders == expected
@@ -0,0 +1,32 @@
+import io
+import os
+import subprocess
+import sys
+from asimr import acb
+from asimr.__main__ import load
+from asimr.device import Console
+from conftest import compile_source
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def write(tmp_path, code):
+    file = str(tmp_path / "main.acb")
+    acb.write(compile_source(code), file)
+    return file
+
+
+def test_memory_values(tmp_path):
+    # 数据内存的单元不截断为字节，可以保存负数
+    file = write(tmp_path, "MOV 1000 &0x0\nSUB 5 &0x1 &0x2\nPNC &0x0\nHALT")
+    out = io.StringIO()
+    cpu, _ = load(file, Console(stream=out))
+    cpu.run()
+    assert out.getvalue() == "1000"
+    assert cpu.memory.read(0x2) == -5
+
+
+def test_exit_code(tmp_path):
+    file = write(tmp_path, "SYSCALL 4 3\nPNC 1")
+    result = subprocess.run([sys.executable, "-m", "asimr", file], cwd=ROOT)
+    assert result.returncode == 3
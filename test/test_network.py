@@ -0,0 +1,159 @@
+import asyncio
+import pytest
+from asimr.constant import Status
+from asimr.device import Memory
+from asimr.scheduler import Scheduler
+from asimr.__main__ import resume
+from asimr.fusion import PairProfile
+from asimr.jit import JIT
+from asimr.profiler import Profile
+from conftest import make_core
+
+# 参数块：&0x0 bind/connect，&0x10 send/recv，&0x20 accept/close/listen
+CLIENT = """SYSCALL 12
+MSR r_1
+MOV r_1 &0x0
+MOV r_1 &0x10
+MOV r_1 &0x20
+SYSCALL 16 &0x0
+SYSCALL 17 &0x10
+SYSCALL 19 &0x10
+MSR r_2
+SYSCALL 18 &0x20
+HALT
+"""
+
+SERVER = """SYSCALL 12
+MSR r_1
+MOV r_1 &0x0
+MOV r_1 &0x20
+SYSCALL 15 &0x0
+SYSCALL 14 &0x20
+SYSCALL 13 &0x20
+MSR r_2
+MOV r_2 &0x10
+SYSCALL 19 &0x10
+MSR r_3
+MOV r_3 &0x18
+SYSCALL 17 &0x10
+HALT
+"""
+
+
+def network_core(code, port=0, text=b""):
+    # 在内存中写好地址、端口和缓冲区
+    cpu = make_core(code, Memory(256, strict=True))
+    memory = cpu.memory
+    memory.write_block(0x4, bytes([127, 0, 0, 1]))
+    memory.write_block(0x8, port.to_bytes(4, "little"))
+    memory.write_block(0x14, (0x40).to_bytes(4, "little"))
+    memory.write_block(0x18, (len(text) or 16).to_bytes(4, "little"))
+    memory.write_block(0x24, (8).to_bytes(4, "little"))
+    memory.write_block(0x40, text)
+    return cpu
+
+
+def test_client():
+    async def handle(reader, writer):
+        data = await reader.read(16)
+        writer.write(data.upper())
+        await writer.drain()
+        writer.close()
+
+    async def main():
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        scheduler = Scheduler()
+        cores = [network_core(CLIENT, port, b"hello %d" % i) for i in range(5)]
+        for cpu in cores:
+            scheduler.add(cpu)
+        stats = await scheduler.run_async()
+        server.close()
+        return cores, stats
+
+    cores, stats = asyncio.run(main())
+    for i, cpu in enumerate(cores):
+        assert stats[i]["status"] == "halted"
+        assert cpu.register.get(2) == 7
+        assert bytes(cpu.memory.read_block(0x40, 7)) == b"HELLO %d" % i
+        assert not cpu.network.sockets
+
+
+def test_server():
+    cpu = network_core(SERVER)
+
+    async def client():
+        # 等服务端阻塞在 accept 上后再连接
+        while cpu.pending is None:
+            await asyncio.sleep(0)
+        port = cpu.network.sockets[3].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"ping")
+        data = await reader.read(16)
+        writer.close()
+        return data
+
+    async def main():
+        scheduler = Scheduler()
+        scheduler.add(cpu)
+        return await asyncio.gather(scheduler.run_async(), client())
+
+    stats, data = asyncio.run(main())
+    assert stats[0]["status"] == "halted"
+    assert data == b"ping"
+
+
+def test_blocked_without_loop():
+    # 没有事件循环时 run() 返回 BLOCKED，交给调度器继续
+    cpu = network_core(CLIENT, 1)
+    assert cpu.run() == Status.BLOCKED
+    assert cpu.register.pc == 5
+    cpu.shutdown()
+
+
+def test_invalid_arguments():
+    # 端口超出范围、缓冲区越界时返回 -1，VM 继续执行
+    cpu = network_core(
+        "SYSCALL 12\nMSR r_1\nMOV r_1 &0x0\nSYSCALL 15 &0x0\nHALT", 1 << 20
+    )
+    assert cpu.run() == Status.HALTED
+    assert cpu.register.sr == -1
+    cpu = network_core("SYSCALL 12\nMSR r_1\nMOV r_1 &0x10\nSYSCALL 17 &0x10\nHALT")
+    cpu.memory.write_block(0x14, (0x1000).to_bytes(4, "little"))
+    assert cpu.run() == Status.HALTED
+    assert cpu.register.sr == -1
+
+
+@pytest.mark.parametrize("mode", ["jit", "profile", "pairs"])
+def test_resume(mode):
+    # JIT 和剖析的执行循环阻塞后也能在事件循环中继续
+    cpu = network_core(SERVER)
+    execute = {
+        "jit": JIT(cpu, threshold=1).run,
+        "profile": lambda: Profile().run(cpu),
+        "pairs": lambda: PairProfile().run(cpu),
+    }[mode]
+
+    async def client():
+        while cpu.pending is None:
+            await asyncio.sleep(0)
+        port = cpu.network.sockets[3].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"ping")
+        data = await reader.read(16)
+        writer.close()
+        return data
+
+    async def main():
+        assert execute() == Status.BLOCKED
+        return await asyncio.gather(resume(cpu, execute), client())
+
+    _, data = asyncio.run(main())
+    assert data == b"ping"
+    assert not cpu.network.sockets
+
+
+def test_error_result():
+    cpu = network_core("SYSCALL 18 &0x20\nMSR r_1\nHALT")
+    assert cpu.run() == Status.HALTED
+    assert cpu.register.get(1) == 0xFF  # -1
@@ -1,5 +1,11 @@
 import pytest
-from asimr.core import Instruction, Operand, InstructionSet, OperandType
+from asimr.core import (
+    Instruction,
+    Operand,
+    InstructionSet,
+    OperandType,
+    INSTRUCTION_SIZE,
+)
 
 
 def test_pack_unpack():
@@ -72,6 +78,33 @@ def test_unpack_too_much_data():
     assert unpacked_instruction.parameter.type == OperandType.Number
 
 
+def test_pack_fixed_width():
+    # 无论有几个操作数，编码后都是 16 字节
+    for operands in range(4):
+        args = [Operand(i, OperandType.Number) for i in range(operands)]
+        data = Instruction(InstructionSet.ADD, *args).pack()
+        assert len(data) == INSTRUCTION_SIZE
+        unpacked = Instruction.unpack(data)
+        missing = [unpacked.source, unpacked.target, unpacked.parameter][operands:]
+        assert missing == [None] * (3 - operands)
+
+
+def test_unpack_legacy():
+    # 旧的变长编码只包含实际存在的操作数
+    assert Instruction.unpack(b"\x00").source is None
+    data = bytes([InstructionSet.PNC.value, OperandType.Number.value])
+    data += (65).to_bytes(4, byteorder="little")
+    unpacked = Instruction.unpack(data)
+    assert unpacked.opcode == InstructionSet.PNC
+    assert unpacked.source.value == 65
+    assert unpacked.target is None
+    data += bytes([OperandType.Register.value]) + (2).to_bytes(4, "little")
+    unpacked = Instruction.unpack(data)
+    assert unpacked.target.value == 2
+    assert unpacked.target.type == OperandType.Register
+    assert unpacked.parameter is None
+
+
 def test_operand():
     o = Operand(0, OperandType.Memory)
     assert o.type == OperandType.Memory
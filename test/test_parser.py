@@ -1,7 +1,7 @@
 from asimc.cache import LRUCache
-from asimc.parser import Parser, CodeParser
+from asimc.parser import Parser, CodeParser, split_source, stream_source
 import asimc.funcs as asim_f
-from asimr.constant import tmp, InstructionSet
+from asimr.constant import tmp, InstructionSet, GrammarError
 from asimr.core import Instruction
 import pytest
 
@@ -36,7 +36,7 @@ def test_include_file_exists(mocker):
     mocker.patch("builtins.open", f)
     tmp["inc_dir"] = ["."]
     r = asim_f.include("a.ac")
-    ret = ".include_file ./a.ac\n14\n;! end_include ./a.ac"
+    ret = ".include_file ./a.ac\n114514\n;! end_include ./a.ac"
     assert r == ret
 
 
@@ -95,6 +95,91 @@ def test_inst():
     assert out.target.value == 1
 
 
+LOOP = """.n_GPR 4
+MOV 1 r_1
+JMP #skip
+#loop
+NOP
+ADD 1 r_1 r_1
+JNE r_1 10 #loop
+#skip
+NOP
+JMP #loop
+MOV r_1 &0x0
+HALT
+"""
+
+
+def test_forward_label():
+    p = CodeParser()
+    p.parser(LOOP.split("\n"))
+    out = [Instruction.unpack(i) for i in p.out.instructions]
+    assert p.out.labels == {"loop": 2, "skip": 5}
+    assert out[1].source.value == 5
+    assert out[4].parameter.value == 2
+    assert out[6].source.value == 2
+
+
+def test_missing_label():
+    p = CodeParser()
+    with pytest.raises(GrammarError):
+        p.parser(["JMP #nowhere"])
+
+
+@pytest.mark.parametrize("jobs", [2, 3, 5])
+def test_parallel(jobs):
+    # 标签跨越块边界时结果与单进程一致
+    p = CodeParser()
+    p.parser(LOOP.split("\n"))
+    parallel = Parser(LOOP, jobs)
+    parallel.parser()
+    assert parallel.out.instructions == p.out.instructions
+    assert parallel.out.labels == p.out.labels
+    assert parallel.out.lines == p.out.lines
+    assert parallel.out.n_GPR == 4
+
+
+def test_parallel_register():
+    # 后面的块使用的寄存器按前面块设置的 n_GPR 检查
+    with pytest.raises(GrammarError):
+        Parser(".n_GPR 2\nNOP\nNOP\nMOV 1 r_3", 3).parser()
+
+
+def test_split_source():
+    code = "a\nbb\n\ncccc\nd"
+    chunks = split_source(code, 3)
+    assert "\n".join(text for text, _ in chunks) == code
+    for text, line in chunks:
+        assert code.split("\n")[line - 1 : line - 1 + text.count("\n") + 1] == (
+            text.split("\n")
+        )
+    assert len(split_source("a", 4)) == 1
+
+
+def test_stream_source():
+    code = "a\nbb\n\ncccc\nd\n"
+    pieces = list(code)  # 每次产出一个字符
+    chunks = list(stream_source(pieces, 3))
+    assert "\n".join(text for text, _ in chunks) == code
+    assert len(chunks) > 1
+    for text, line in chunks:
+        assert code.split("\n")[line - 1 : line - 1 + text.count("\n") + 1] == (
+            text.split("\n")
+        )
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_parallel_stream(jobs):
+    p = CodeParser()
+    p.parser(LOOP.split("\n"))
+    pieces = (line + "\n" for line in LOOP.split("\n"))
+    stream = Parser(pieces, jobs, chunk_size=8)
+    stream.parser()
+    assert stream.out.instructions == p.out.instructions
+    assert stream.out.labels == p.out.labels
+    assert stream.out.lines == p.out.lines
+
+
 # 运行测试
 if __name__ == "__main__":
     pytest.main()
@@ -0,0 +1,127 @@
+import asyncio
+from asimr.constant import Status, ASIMError
+from asimr.device import Memory
+from asimr.pool import VMPool
+import pytest
+from conftest import compile_source
+
+DATA_MEM = ".data_mem 256"  # 程序默认的数据内存超过池的大小
+
+
+def test_run_and_reuse():
+    pool = VMPool(1, data_mem=256)
+    program = compile_source(
+        "ADD r_0 &0x10 r_1\nMOV r_1 &0x11\nPNC r_1\nHALT", DATA_MEM
+    )
+    for i in range(3):
+        result = pool.run(program, registers={0: i}, memory={0x10: [100]})
+        assert result.status == Status.HALTED
+        assert result.output == str(100 + i)
+        assert result.registers[:2] == [i, 100 + i]
+        assert result.tc == 3
+    cpu = pool.acquire(program)
+    # 复位后内存、寄存器和输出都已清空，且没有重新链接
+    assert cpu.memory.dirty is None
+    assert list(cpu.memory.read_block(0x10, 2)) == [0, 0]
+    assert cpu.register.get(1) == 0
+    assert pool.loaded[cpu] is program
+    pool.release(cpu)
+
+
+def test_exit_code():
+    pool = VMPool(2)
+    result = pool.run(compile_source("MOV 7 r_1\nSYSCALL 4 r_1\nPNC 1", DATA_MEM))
+    assert result.status == Status.HALTED
+    assert result.exit_code == 7
+    assert result.output == ""
+    assert pool.run(compile_source("HALT", DATA_MEM)).exit_code == 0
+
+
+def test_error_and_limit():
+    pool = VMPool(1)
+    result = pool.run(compile_source("MOD 0 1 r_1\nHALT", DATA_MEM))
+    assert result.status == Status.ERROR
+    assert result.error is not None
+
+    result = pool.run(compile_source("#l\nNOP\nJMP #l", DATA_MEM), limit=100)
+    assert result.status == Status.READY
+    assert result.tc == 100
+
+
+def test_program_too_large():
+    pool = VMPool(1, n_GPR=4)
+    with pytest.raises(Exception):
+        pool.run(compile_source(".n_GPR 8\nHALT", DATA_MEM))
+    assert pool.free.qsize() == 1
+
+
+@pytest.mark.parametrize("config", [".data_mem 1024", ".stack_size 128"])
+def test_program_needs_more(config):
+    pool = VMPool(1, data_mem=512)
+    with pytest.raises(ASIMError):
+        pool.acquire(compile_source(config + "\nHALT", DATA_MEM))
+    assert pool.free.qsize() == 1
+
+
+def test_reset_cancels_pending():
+    pool = VMPool(1)
+    # accept 在事件循环上等待连接时复位 Core
+    program = compile_source(
+        "SYSCALL 12\nMSR r_1\nMOV r_1 &0x20\nMOV 8 &0x24\n"
+        "SYSCALL 14 &0x20\nSYSCALL 13 &0x20\nHALT",
+        DATA_MEM,
+    )
+
+    async def main():
+        cpu = pool.acquire(program)
+        assert cpu.run() == Status.BLOCKED
+        task = cpu.pending
+        sock = cpu.network.sockets[3]
+        cpu.reset()
+        await asyncio.sleep(0)
+        assert task.cancelled()
+        assert cpu.pending is None
+        assert sock.fileno() == -1
+        pool.release(cpu)
+
+    asyncio.run(main())
+
+
+def test_clear_dirty():
+    memory = Memory(64, strict=True)
+    memory.write(3, 1)
+    memory.fill(10, 2, 4)
+    assert memory.dirty == [3, 14]
+    memory.data[40] = 5  # 直接写入不被跟踪，由调用者给出范围
+    memory.clear_dirty(40, 41)
+    assert memory.dirty is None
+    assert not any(memory.data)
+
+
+def test_memory_values():
+    # 默认的数据内存与 asimr 相同，单元不截断为字节
+    pool = VMPool(1)
+    cpu = pool.acquire(
+        compile_source("MOV 1000 &0x10\nSUB 5 &0x11 &0x12\nHALT", DATA_MEM)
+    )
+    cpu.run()
+    assert cpu.memory.read(0x10) == 1000
+    assert cpu.memory.read(0x12) == -5
+    pool.release(cpu)
+
+
+def test_program_limits():
+    pool = VMPool(1, data_mem=256)
+    small = compile_source(
+        ".n_GPR 4\n.stack_size 4\n" + "PUSH 1\n" * 5 + "HALT", DATA_MEM
+    )
+    result = pool.run(small)
+    # 使用程序设置的栈深度和寄存器数，而不是池的
+    assert result.status == Status.ERROR
+    assert "overflow" in str(result.error)
+    assert len(result.registers) == 4
+
+    deep = compile_source("PUSH 1\n" * 5 + "HALT", DATA_MEM)
+    result = pool.run(deep)
+    assert result.status == Status.HALTED
+    assert len(result.registers) == 16
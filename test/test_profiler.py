@@ -0,0 +1,99 @@
+import json
+from asimc.parser import Parser
+from asimr.constant import Blocked, Status
+from asimr.fusion import PairProfile, load_pairs
+from asimr.profiler import Profile
+from conftest import compile_source, make_core
+
+CODE = """MOV 0 r_0
+JMP 4
+#func
+NOP
+ADD 1 r_1 r_1
+RET
+#main
+NOP
+CALL #func
+ADD 1 r_0 r_0
+JNE r_0 3 #main
+HALT
+"""
+
+
+def test_line_table():
+    program = compile_source(CODE)
+    assert len(program.lines) == len(program.instructions)
+    assert program.lines[:3] == [1, 2, 4]
+    assert program.lines[-1] == 12
+
+
+def test_line_table_workers():
+    # 每个工作进程解析的部分按其在源码中的位置编号
+    p = Parser("MOV 1 r_1\n\nADD 1 r_1 r_1\n; c\nPNC r_1\nHALT", 3)
+    p.parser()
+    assert p.out.lines == [1, 3, 5, 6]
+
+
+def test_profile(tmp_path):
+    cpu = make_core(CODE)
+    profile = Profile(cpu.info)
+    profile.run(cpu)
+    assert cpu.register.get(1) == 3
+
+    file = str(tmp_path / "profile.json")
+    profile.save(file)
+    with open(file) as f:
+        report = json.load(f)
+
+    assert report["instructions"] == cpu.register.tc + 1  # 包括 HALT
+    assert report["opcodes"]["CALL"]["count"] == 3
+    assert report["opcodes"]["ADD"]["count"] == 6
+    assert report["classes"]["arithmetic"]["count"] == 6
+    hot = {p["pc"]: p for p in report["pcs"]}
+    assert hot[3] == {"pc": 3, "line": 5, "opcode": "ADD", "count": 3}
+    assert [(c["label"], c["line"], c["count"]) for c in report["calls"]] == [
+        ("func", 5, 3)
+    ]
+    assert [5, 3] in report["lines"]
+
+    # 输出文件可以直接交给 --fuse
+    pairs = load_pairs(file)
+    assert pairs[("ADD", "RET")] == 3
+
+
+def block_once(cpu, pc):
+    # 第一次执行时阻塞，恢复后再执行原来的指令
+    handler = cpu.handler(pc)
+    state = {"blocked": False}
+
+    def blocking():
+        if not state["blocked"]:
+            state["blocked"] = True
+            raise Blocked()
+        handler()
+
+    cpu.program[pc] = blocking
+
+
+def test_profile_blocked():
+    cpu = make_core("MOV 1 r_1\nADD 1 r_1 r_1\nPNC r_1\nHALT")
+    block_once(cpu, 2)
+    profile = Profile(cpu.info)
+    assert profile.run(cpu) == Status.BLOCKED
+    assert profile.run(cpu) == Status.HALTED
+    report = profile.report()
+    # 阻塞后重新执行的指令只计一次
+    assert report["instructions"] == 4
+    assert report["opcodes"]["PNC"]["count"] == 1
+    assert {p["pc"]: p["count"] for p in report["pcs"]} == {0: 1, 1: 1, 2: 1, 3: 1}
+    assert [n for a, b, n in report["pairs"] if (a, b) == ("ADD", "PNC")] == [1]
+
+
+def test_pair_profile_blocked():
+    cpu = make_core("MOV 1 r_1\nADD 1 r_1 r_1\nADD 1 r_1 r_1\nHALT")
+    block_once(cpu, 2)
+    profile = PairProfile()
+    assert profile.run(cpu) == Status.BLOCKED
+    assert profile.run(cpu) == Status.HALTED
+    assert profile.counts[("ADD", "ADD")] == 1
+    assert profile.counts[("ADD", "HALT")] == 1
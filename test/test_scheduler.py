@@ -0,0 +1,77 @@
+from asimr.constant import Blocked, Status
+from asimr.scheduler import Scheduler
+import asimr.instruction as instruction
+from conftest import make_core
+
+COUNT = """MOV 0 r_0
+#loop
+NOP
+ADD 1 r_0 r_0
+JNE r_0 {n} #loop
+PNC r_0
+HALT
+"""
+
+
+def test_step():
+    cpu = make_core(COUNT.format(n=10))
+    assert cpu.step(5) == Status.READY
+    assert cpu.register.tc == 5
+    assert cpu.run(quantum=1000) == Status.HALTED
+    assert cpu.register.get(0) == 10
+    assert cpu.console.stream.getvalue() == "10"
+
+
+def test_run_without_quantum():
+    cpu = make_core(COUNT.format(n=3))
+    assert cpu.run() == Status.HALTED
+    assert cpu.register.get(0) == 3
+
+
+def test_round_robin():
+    scheduler = Scheduler(quantum=7)
+    cores = [make_core(COUNT.format(n=n)) for n in range(1, 200, 10)]
+    for cpu in cores:
+        scheduler.add(cpu)
+    stats = scheduler.run()
+    for i, cpu in enumerate(cores):
+        n = 1 + 10 * i
+        assert cpu.console.stream.getvalue() == str(n)
+        assert stats[i]["status"] == "halted"
+        assert stats[i]["instructions"] == cpu.register.tc == 2 * n + 3
+
+
+def test_error_isolated():
+    scheduler = Scheduler(quantum=4)
+    bad = scheduler.add(make_core("MOD 0 1 r_1\nHALT"), "bad")
+    good = scheduler.add(make_core(COUNT.format(n=5)), "good")
+    stats = scheduler.run()
+    assert bad.status == Status.ERROR
+    assert stats["bad"]["error"]
+    assert good.status == Status.HALTED
+
+
+def test_blocked_skipped(monkeypatch):
+    # SYSCALL 在标志置位前一直阻塞，期间其他 VM 照常运行
+    flag = []
+
+    def SYSCALL(cpu, ins):
+        if not flag:
+            raise Blocked(lambda: bool(flag))
+
+    monkeypatch.setattr(instruction, "SYSCALL", SYSCALL)
+    scheduler = Scheduler(quantum=10)
+    waiting = scheduler.add(make_core("SYSCALL 1\nPNC 1\nHALT"))
+    other = scheduler.add(make_core(COUNT.format(n=20)))
+
+    for _ in range(3):
+        scheduler.step()
+    assert waiting.status == Status.BLOCKED
+    assert waiting.instructions == 0
+    assert not waiting.ready()
+    assert other.instructions == 30
+
+    flag.append(1)
+    scheduler.run()
+    assert waiting.status == Status.HALTED
+    assert waiting.core.console.stream.getvalue() == "1"
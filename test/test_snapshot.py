@@ -0,0 +1,96 @@
+from asimr.constant import SyscallTable, Program
+from asimr.device import Memory, Stack
+from asimr.snapshot import dump, restore, is_snapshot
+import mmap
+import pytest
+from conftest import make_core
+
+CODE = f"""
+MOV 7 r_1
+MOV 9 &0x3
+PUSH 5
+SYSCALL {SyscallTable.snapshot.value}
+ADD r_1 &0x3 r_2
+POP r_3
+HALT
+"""
+
+
+def test_snapshot_roundtrip(tmp_path):
+    file = str(tmp_path / "vm.asnap")
+    cpu = make_core(CODE, stack=8)
+    cpu.snapshot_file = file
+    cpu.run()
+    assert is_snapshot(file)
+
+    restored, program = restore(file)
+    assert restored.register.pc == 4
+    assert restored.stack.sp == 1
+    restored.run()
+    assert restored.register._GPR == cpu.register._GPR
+    assert restored.register.tc == cpu.register.tc
+    assert bytes(restored.memory.data) == bytes(cpu.memory.data)
+
+
+def test_snapshot_mmap(tmp_path):
+    file = str(tmp_path / "vm.asnap")
+    cpu = make_core(CODE, Memory(8192, strict=True), stack=8)
+    cpu.memory.write(8000, 42)
+    dump(cpu, file, Program(labels={"main": 0}))
+
+    restored, program = restore(file, mmap_threshold=4096)
+    assert isinstance(restored.memory.data, mmap.mmap)
+    assert restored.memory.read(8000) == 42
+    assert program.labels == {"main": 0}
+    restored.memory.write(8000, 1)  # 写时复制，不影响快照文件
+    again, _ = restore(file, mmap_threshold=4096)
+    assert again.memory.read(8000) == 42
+
+
+def test_snapshot_program(tmp_path):
+    # 程序内调用 snapshot 时保存加载的标签和行号表
+    file = str(tmp_path / "vm.asnap")
+    cpu = make_core(CODE, stack=8)
+    cpu.info = Program(labels={"main": 0}, lines=[2, 3, 4, 5, 6, 7, 8])
+    cpu.snapshot_file = file
+    cpu.run()
+    _, program = restore(file)
+    assert program.labels == {"main": 0}
+    assert program.lines == [2, 3, 4, 5, 6, 7, 8]
+
+
+def test_snapshot_big_values(tmp_path):
+    # 超出 int64 的栈和非严格内存的值原样恢复
+    file = str(tmp_path / "vm.asnap")
+    cpu = make_core(CODE, stack=8)
+    cpu.memory = Memory(16)
+    cpu.memory.write(3, 1 << 70)
+    cpu.stack.push(-(1 << 80))
+    dump(cpu, file)
+    restored, _ = restore(file)
+    assert restored.memory.read(3) == 1 << 70
+    assert restored.stack.data[0] == -(1 << 80)
+
+
+def test_snapshot_unbounded_stack(tmp_path):
+    file = str(tmp_path / "vm.asnap")
+    cpu = make_core(CODE, stack=8)
+    cpu.stack = Stack(0)
+    for i in range(10):
+        cpu.stack.push(i)
+    dump(cpu, file)
+    restored, _ = restore(file)
+    assert restored.stack.size == 0
+    assert restored.stack.pop() == 9
+
+
+def test_snapshot_instruction_gap(tmp_path):
+    # 指令内存中未写入的位置在快照中为空指令，恢复时按 HALT 加载
+    file = str(tmp_path / "vm.asnap")
+    cpu = make_core(CODE, stack=8)
+    cpu.instruction_memory.write(10, cpu.instruction_memory.read(0))
+    dump(cpu, file)
+    restored, program = restore(file)
+    assert len(program.instructions) == 11
+    assert restored.code[8].opcode.name == "HALT"
+    assert restored.code[10].opcode.name == "MOV"
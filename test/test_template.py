@@ -0,0 +1,42 @@
+import os
+import pytest
+from asimc.template import BytecodeCache, environment
+
+MACROS = """% macro twice(x) %
+ADD {x} r_1 r_1
+ADD {x} r_1 r_1
+% endmacro %
+"""
+
+
+@pytest.fixture
+def search(tmp_path):
+    (tmp_path / "macros.ac").write_text(MACROS)
+    (tmp_path / "main.ac").write_text('% import "macros.ac" as m %\n{m.twice(3)}\n')
+    return [str(tmp_path)]
+
+
+def test_import(search):
+    text = environment(search).get_template("main.ac").render()
+    assert text.split() == ["ADD", "3", "r_1", "r_1"] * 2
+
+
+def test_bytecode_cache(search, tmp_path):
+    cache_dir = str(tmp_path / "jinja")
+    environment(search, cache_dir).get_template("main.ac").render()
+    assert len(os.listdir(cache_dir)) == 2  # 主模板和宏库
+
+    # 新的环境直接加载缓存的字节码，不再编译
+    env = environment(search, cache_dir)
+
+    def compile(*args, **kwargs):
+        raise AssertionError("template was recompiled")
+
+    env.compile = compile
+    assert "ADD 3" in env.get_template("main.ac").render()
+
+
+def test_cache_key(tmp_path):
+    a = BytecodeCache(str(tmp_path))
+    b = BytecodeCache(str(tmp_path), {"block_start_string": "{%"})
+    assert a.get_cache_key("main.ac") != b.get_cache_key("main.ac")
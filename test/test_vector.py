@@ -0,0 +1,54 @@
+from asimr.constant import MemoryError
+from asimr.device import Memory
+import asimr.instruction.vector as vector
+import pytest
+from conftest import make_core
+
+CODE = """
+VLEN 4
+VADD &0x0 &0x10 &0x20
+VSUB &0x0 &0x10 &0x30
+VMUL &0x0 &0x10 &0x40
+VXOR &0x0 &0x10 &0x50
+VCMP &0x0 &0x10 &0x60
+VSUM &0x10 r_1
+VMIN &0x10 r_2
+VMAX &0x10 &0x70
+HALT
+"""
+
+
+def run(strict=True):
+    cpu = make_core(CODE, Memory(128, strict=strict))
+    cpu.memory.write_block(0x0, [1, 2, 200, 7])
+    cpu.memory.write_block(0x10, [1, 250, 100, 9])
+    cpu.run()
+    return cpu
+
+
+def check(cpu):
+    mem = cpu.memory
+    assert list(mem.read_block(0x20, 4)) == [2, 252, 44, 16]  # 按8位回绕
+    assert list(mem.read_block(0x30, 4)) == [0, 248, 156, 2]
+    assert list(mem.read_block(0x40, 4)) == [1, 244, 32, 63]
+    assert list(mem.read_block(0x50, 4)) == [0, 248, 172, 14]
+    assert list(mem.read_block(0x60, 4)) == [1, 0, 0, 0]
+    assert cpu.register.get(1) == (1 + 250 + 100 + 9) & 0xFF
+    assert cpu.register.get(2) == 1
+    assert mem.read(0x70) == 250
+
+
+def test_vector_numpy():
+    pytest.importorskip("numpy")
+    check(run())
+
+
+def test_vector_fallback(mocker):
+    mocker.patch.object(vector, "numpy", None)
+    check(run())
+
+
+def test_vector_out_of_bounds():
+    cpu = make_core("VLEN 8\nVADD &0x0 &0x0 &0x7c", Memory(128, strict=True))
+    with pytest.raises(MemoryError):
+        cpu.run()